@@ -0,0 +1,223 @@
+"""Time the import stages on synthetic models of growing size.
+
+The parse, vertex column and mesh preparation stages run with plain Python:
+
+    python benchmarks/run_benchmarks.py
+
+The mesh build, weight and material stages need Blender:
+
+    blender -b --python benchmarks/run_benchmarks.py -- --sizes 1000 100000
+
+Every run is appended to a JSON history and compared with the last run that
+timed the same stage and size.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import synthetic_model
+from io_import_snowrunner import geometry, model_parser
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000, 5000000]
+MAX_MESH_VERTICES = 50000
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the Snowrunner importer on synthetic models")
+    parser.add_argument("--sizes", type=int, nargs='+', default=DEFAULT_SIZES, help="Total vertex counts to benchmark")
+    parser.add_argument("--skinned", action="store_true", help="Use skinned instead of static meshes")
+    parser.add_argument("--triangle-ratio", type=float, default=1.5, help="Triangles per vertex (default: 1.5)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage, the fastest one is recorded")
+    parser.add_argument("--history", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.json"),
+                        help="JSON file the results are appended to")
+    parser.add_argument("--label", default="", help="Note stored with the run, e.g. a commit or branch name")
+    parser.add_argument("--work-dir", help="Where the synthetic models are written (default: a temporary directory)")
+    return parser.parse_args(argv)
+
+@contextlib.contextmanager
+def quiet():
+    # Console output is not what is being measured
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def best_time(function, repeat, setup=None):
+    best = math.inf
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with quiet():
+            started = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - started)
+    return best
+
+def write_model(work_dir, size, skinned, triangle_ratio):
+    mesh_count = math.ceil(size / MAX_MESH_VERTICES)
+    vertex_count = size // mesh_count
+    file_path = os.path.join(work_dir, f"{'skinned' if skinned else 'static'}_{size}")
+    if not os.path.exists(file_path):
+        synthetic_model.write_model(file_path, node_count=mesh_count + 1, mesh_count=mesh_count,
+                                    vertex_count=vertex_count, triangle_count=int(vertex_count * triangle_ratio),
+                                    skinned=skinned)
+    return file_path
+
+def mesh_nodes(model):
+    return [node for node in model.nodes if node.mesh is not None]
+
+def bench_parse(file_path, repeat):
+    return best_time(lambda: model_parser.parse_data(file_path), repeat)
+
+def bench_columns(model, repeat):
+    # Parsing only maps the file, this is where the vertex bytes are converted
+    def convert():
+        for node in mesh_nodes(model):
+            vertices, _, _, _, _ = geometry.mesh_columns(node.mesh)
+            geometry.valid_triangles(node.mesh.triangles, len(vertices))
+
+    return best_time(convert, repeat)
+
+def bench_prepare(model, repeat):
+    # Everything the build stage hands to bpy, converted in threads
+    bone_ids = {node.node_id for node in model.nodes if node.name}
+
+    def prepare():
+        for _ in geometry.prepare_meshes(model.nodes, bone_ids):
+            pass
+
+    return best_time(prepare, repeat)
+
+def reset_scene():
+    bpy.ops.wm.read_homefile(use_empty=True)
+
+def bench_build(model, repeat):
+    from io_import_snowrunner import model_importer
+
+    def build():
+        for node in mesh_nodes(model):
+            vertices, uvs, normals, _, _ = geometry.mesh_columns(node.mesh)
+            valid = geometry.valid_triangles(node.mesh.triangles, len(vertices))
+            model_importer.build_mesh(node.mesh.name, vertices, node.mesh.triangles[valid], uvs, normals)
+
+    return best_time(build, repeat, reset_scene)
+
+def bench_weights(model, repeat):
+    from io_import_snowrunner import model_importer
+    objects = []
+
+    def setup():
+        reset_scene()
+        objects.clear()
+        for node in mesh_nodes(model):
+            mesh = bpy.data.meshes.new(node.mesh.name)
+            mesh.vertices.add(node.mesh.vertex_count)
+            obj = bpy.data.objects.new(node.name, mesh)
+            groups = {index: obj.vertex_groups.new(name=str(node_id))
+                      for index, node_id in enumerate(node.mesh.linked_nodes.tolist())}
+            objects.append((node, groups))
+
+    def assign():
+        for node, groups in objects:
+            _, _, _, weights, links = geometry.mesh_columns(node.mesh)
+            model_importer.assign_vertex_weights(groups, geometry.weight_buckets(weights, links, groups))
+
+    return best_time(assign, repeat, setup)
+
+def bench_materials(model, repeat):
+    from io_import_snowrunner import material_importer, texture_index
+    # No texture tree, so this times building the materials, not loading images
+    textures = texture_index.TextureIndex('')
+    return best_time(lambda: material_importer.import_materials(model, textures), repeat, reset_scene)
+
+def load_history(history_path):
+    if os.path.exists(history_path):
+        with open(history_path, 'r') as f:
+            return json.load(f)
+    return []
+
+def previous_result(history, result):
+    for run in reversed(history):
+        for earlier in run['results']:
+            if all(earlier[key] == result[key] for key in ('stage', 'vertices', 'skinned')):
+                return earlier
+    return None
+
+def run(args):
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="snowrunner_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    history = load_history(args.history)
+
+    results = []
+    try:
+        for size in args.sizes:
+            file_path = write_model(work_dir, size, args.skinned, args.triangle_ratio)
+            with quiet():
+                model = model_parser.parse_data(file_path)
+            if model.error:
+                raise RuntimeError(f"Synthetic model {file_path} failed to parse: {model.error}")
+            vertices = sum(node.mesh.vertex_count for node in mesh_nodes(model))
+
+            stages = [('parse', lambda: bench_parse(file_path, args.repeat)),
+                      ('columns', lambda: bench_columns(model, args.repeat)),
+                      ('prepare', lambda: bench_prepare(model, args.repeat))]
+            if bpy is not None:
+                stages.append(('build', lambda: bench_build(model, args.repeat)))
+                if args.skinned:
+                    stages.append(('weights', lambda: bench_weights(model, args.repeat)))
+                stages.append(('materials', lambda: bench_materials(model, args.repeat)))
+
+            for stage, bench in stages:
+                seconds = bench()
+                result = {
+                    'stage': stage,
+                    'vertices': vertices,
+                    'skinned': args.skinned,
+                    'seconds': round(seconds, 6),
+                    'vertices_per_second': round(vertices / seconds) if seconds > 0 else None
+                }
+                results.append(result)
+
+                earlier = previous_result(history, result)
+                change = ''
+                if earlier is not None and earlier['seconds'] > 0:
+                    change = f"{(seconds / earlier['seconds'] - 1) * 100:+.1f}% vs last run"
+                print(f"{stage:>10} {vertices:>9} vertices {seconds * 1000:10.2f} ms {change}")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    history.append({
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'label': args.label,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'blender': bpy.app.version_string if bpy is not None else None,
+        'results': results
+    })
+    with open(args.history, 'w') as f:
+        json.dump(history, f, indent=1)
+    print(f"Results appended to {args.history}")
+
+def main(argv=None):
+    if argv is None:
+        # Split like batch_convert.main
+        argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    run(parse_args(argv))
+
+if __name__ == "__main__":
+    main()
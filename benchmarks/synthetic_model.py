@@ -0,0 +1,184 @@
+"""Write synthetic [meshes] files for the benchmarks.
+
+    python benchmarks/synthetic_model.py <output file> --vertices 100000 --meshes 4 --skinned
+
+The files follow the layout model_parser.parse_data reads, filled with random
+but valid geometry.
+"""
+import argparse
+import struct
+import numpy as np
+
+# (unknown, offset, data type, item type) vertex layout blocks
+STATIC_LAYOUT = [(0, 0, 2, 0x0000), (0, 12, 1, 0x0005), (0, 20, 8, 0x0105), (0, 24, 5, 0x0205)]
+SKINNED_LAYOUT = [(0, 0, 2, 0x0000), (0, 12, 1, 0x0005), (0, 20, 5, 0x0105), (0, 24, 5, 0x0405), (0, 28, 8, 0x0505), (0, 32, 5, 0x0605)]
+
+# Vertex bytes per data type, and per item type for data type 5. Written
+# independently of the parser's tables so the files check them.
+DATA_TYPE_FORMATS = {2: ('<f4', 3), 1: ('<f4', 2), 8: ('u1', 4)}
+UNKNOWN_FORMATS = {0x0405: ('i1', 4), 0x0105: ('i1', 4), 0x0605: ('<f8', 1), 0x0505: ('u1', 4)}
+
+IDENTITY = np.eye(4, dtype=np.float32)
+
+def pack_string(value):
+    encoded = value.encode() + b'\0'
+    return struct.pack('<i', len(encoded)) + encoded
+
+def pack_node(parent_id, node_id, name, matrix):
+    return struct.pack('<hhhh', parent_id, node_id, 0, 0) + pack_string(name) + np.asarray(matrix, dtype='<f4').tobytes()
+
+def block_format(block):
+    _, _, data_type, item_type = block
+    if data_type in DATA_TYPE_FORMATS:
+        return DATA_TYPE_FORMATS[data_type]
+    return UNKNOWN_FORMATS.get(item_type)
+
+def vertex_data(rng, layout, vertex_count, link_count):
+    fields = []
+    for i, block in enumerate(layout):
+        item_format = block_format(block)
+        if item_format is not None:
+            fields.append((f'f{i}', item_format[0], (item_format[1],)))
+    vertices = np.zeros(vertex_count, dtype=fields)
+
+    for i, (_, _, data_type, item_type) in enumerate(layout):
+        name = f'f{i}'
+        if name not in vertices.dtype.names:
+            continue
+        column = vertices[name]
+        if item_type == 0x0505:
+            column[:] = rng.integers(0, max(link_count, 1), column.shape)
+        elif item_type == 0x0405:
+            # One full weight and three smaller ones
+            column[:] = rng.integers(0, 64, column.shape)
+            column[:, 0] = 127
+        elif column.dtype.kind == 'f':
+            column[:] = rng.uniform(-1.0, 1.0, column.shape)
+        else:
+            info = np.iinfo(column.dtype)
+            column[:] = rng.integers(info.min, info.max, column.shape, endpoint=True)
+    return vertices.tobytes()
+
+def triangle_rings(vertex_count):
+    """Yield the (start count, stride) of each ring of triangles (j, j + s, j + 2s) around n vertices.
+
+    Every stride s < n / 2 gives triangles no other stride does. With n = 3s
+    a ring repeats after s triangles.
+    """
+    for stride in range(1, (vertex_count - 1) // 2 + 1):
+        yield (vertex_count // 3 if 3 * stride == vertex_count else vertex_count), stride
+
+def triangle_indices(rng, vertex_count, triangle_count):
+    """Return (triangle_count, 3) indices of distinct triangles with distinct corners.
+
+    The triangles step around a shuffled vertex order, a strip closed into a
+    ring, with a wider stride on each pass once a ring is used up.
+    """
+    order = rng.permutation(vertex_count)
+    rings = [np.empty((0, 3), dtype=np.int64)]
+    remaining = triangle_count
+    for count, stride in triangle_rings(vertex_count):
+        if remaining <= 0:
+            break
+        start = np.arange(min(count, remaining))
+        rings.append(np.stack([start, start + stride, start + 2 * stride], axis=1) % vertex_count)
+        remaining -= len(start)
+    return order[np.concatenate(rings)]
+
+def pack_mesh(rng, name, vertex_count, triangle_count, materials, layout, link_nodes, submesh_count):
+    skinned = len(link_nodes) > 0
+    data = struct.pack('<ii', vertex_count, triangle_count) + pack_string(name)
+    data += struct.pack('<iii', 0, len(materials), 0)
+    for material in materials:
+        data += pack_string(material)
+
+    data += struct.pack('<i', len(link_nodes))
+    data += np.tile(IDENTITY, (len(link_nodes), 1, 1)).astype('<f4').tobytes()
+    data += struct.pack('<h', 0)
+
+    # Triangles split evenly over the submeshes, materials assigned round robin
+    bounds = np.linspace(0, triangle_count, submesh_count + 1).astype(int)
+    submeshes = [(i % len(materials), bounds[i], bounds[i + 1] - bounds[i], 0, vertex_count) for i in range(submesh_count)]
+
+    corners = struct.pack('<6f', -1, -1, -1, 1, 1, 1)
+    if not skinned:
+        data += corners + struct.pack('<i', submesh_count)
+        for submesh in submeshes:
+            data += struct.pack('<5i', *submesh)
+    else:
+        data += struct.pack('<hi', 0, submesh_count)
+        data += struct.pack(f'<{submesh_count}i', *[1] * submesh_count)
+        for i, submesh in enumerate(submeshes):
+            data += struct.pack('<5i', *submesh) + struct.pack('<i', i)
+        data += struct.pack(f'<{len(link_nodes)}h', *link_nodes)
+        data += corners + struct.pack('<ii', 0, 1) + struct.pack('<iiii', 0, triangle_count, 0, vertex_count)
+
+    data += struct.pack('<i', len(layout))
+    for block in layout:
+        data += struct.pack('<hhhh', *block)
+    data += struct.pack('<ii', 0, 0)
+
+    data += vertex_data(rng, layout, vertex_count, len(link_nodes))
+    data += triangle_indices(rng, vertex_count, triangle_count).astype('<u2').tobytes()
+
+    if skinned:
+        data += struct.pack('<h', 0)
+    # End flag without trailing blocks
+    data += struct.pack('<h', 0)
+    return data
+
+def write_model(file_path, node_count=2, mesh_count=1, vertex_count=1000, triangle_count=None,
+                layout=None, skinned=False, material_count=2, submesh_count=2, seed=0):
+    """Write a synthetic model file.
+
+    vertex_count and triangle_count are per mesh, triangles default to one
+    per vertex. Node 0 is the root; meshes go on nodes 1..mesh_count and
+    skinned meshes link to every node.
+    """
+    if mesh_count >= node_count:
+        raise ValueError(f"{mesh_count} meshes need more than {node_count} nodes, node 0 is the mesh-less root")
+    if not 0 < vertex_count <= 65536:
+        raise ValueError(f"Vertex count {vertex_count} does not fit 16 bit triangle indices")
+    if triangle_count is None:
+        triangle_count = vertex_count
+    if triangle_count > sum(count for count, _ in triangle_rings(vertex_count)):
+        raise ValueError(f"{vertex_count} vertices do not make {triangle_count} distinct triangles")
+    if layout is None:
+        layout = SKINNED_LAYOUT if skinned else STATIC_LAYOUT
+
+    rng = np.random.default_rng(seed)
+    materials = [f'material_{i}' for i in range(material_count)]
+    xml = '<Materials>' + ''.join(f'<Material Name="{name}" AlbedoMap="textures/{name}_d.tga" NormalMap="textures/{name}_n.tga"/>'
+                                  for name in materials) + '</Materials>'
+    link_nodes = list(range(min(node_count, 256))) if skinned else []
+
+    with open(file_path, 'wb') as f:
+        encoded = xml.encode()
+        f.write(struct.pack('<i', len(encoded) + 2) + encoded + struct.pack('<hhh', 0, 0, 0))
+        f.write(struct.pack('<i', node_count) + struct.pack('<6f', -1, -1, -1, 1, 1, 1) + struct.pack('<i', mesh_count))
+
+        for node_id in range(node_count):
+            matrix = IDENTITY.copy()
+            matrix[3, :3] = rng.uniform(-1.0, 1.0, 3)
+            f.write(pack_node(node_id - 1 if node_id else -1, node_id, f'node_{node_id}', matrix))
+            if 1 <= node_id <= mesh_count:
+                f.write(pack_mesh(rng, f'mesh_{node_id}', vertex_count, triangle_count, materials, layout,
+                                  link_nodes, submesh_count))
+            else:
+                f.write(struct.pack('<i', 0))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic Snowrunner [meshes] file")
+    parser.add_argument("output", help="File to write")
+    parser.add_argument("--nodes", type=int, default=0, help="Node count (default: meshes + 1)")
+    parser.add_argument("--meshes", type=int, default=1, help="Mesh count")
+    parser.add_argument("--vertices", type=int, default=1000, help="Vertices per mesh (at most 65536)")
+    parser.add_argument("--triangles", type=int, help="Triangles per mesh (default: one per vertex)")
+    parser.add_argument("--skinned", action="store_true", help="Write skinned instead of static meshes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_model(args.output, args.nodes or args.meshes + 1, args.meshes, args.vertices, args.triangles,
+                skinned=args.skinned, seed=args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Convert a tree of extracted [meshes] files into .blend files without the UI.
+
+Full conversion runs inside Blender, with the files decoded in worker
+processes:
+
+    blender -b --python io_import_snowrunner/batch_convert.py -- <meshes dir> <output dir> --textures <editor dir>
+
+Run with plain Python it only decodes the files and reports the results,
+which needs no Blender at all:
+
+    python -m io_import_snowrunner.batch_convert <meshes dir> <output dir>
+
+Progress is kept in a manifest in the output directory, so an interrupted
+run picks up where it stopped.
+"""
+import argparse
+import fnmatch
+import itertools
+import json
+import os
+import sys
+import time
+
+if not __package__:
+    # Run as a script (blender -b --python batch_convert.py), import through the package
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    __package__ = "io_import_snowrunner"
+
+from . import logs, model_cache, model_parser, parse_pool
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+MANIFEST_VERSION = 1
+
+def lod_choice(value):
+    if value in ('highest', 'lowest'):
+        return value
+    if value == 'all':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected all, highest, lowest or a level number, got {value!r}")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Convert extracted Snowrunner [meshes] files into .blend files")
+    parser.add_argument("input_dir", help="Directory of extracted [meshes] files, searched recursively")
+    parser.add_argument("output_dir", help="Directory the .blend files, manifest and report are written to")
+    parser.add_argument("--textures", default="", help="Editor texture root (the extracted editor folder)")
+    parser.add_argument("--pattern", default="*", help="File name pattern of the model files (default: all files)")
+    parser.add_argument("--workers", type=int, default=0, help="Parser processes (default: all but one core)")
+    parser.add_argument("--manifest", help="Manifest path (default: <output dir>/manifest.json)")
+    parser.add_argument("--report", help="Report path (default: <output dir>/report.json)")
+    parser.add_argument("--retry-failed", action="store_true", help="Convert files that failed or crashed in an earlier run again")
+    parser.add_argument("--nodes", nargs='+', default=[], help="Only convert the meshes whose node or mesh name matches one of these patterns, e.g. cab* wheel_fl")
+    parser.add_argument("--threads", type=int, default=0, help="Threads converting mesh data during the build (default: one per core, "
+                        "streamed files use one)")
+    parser.add_argument("--stream-size", type=int, default=0, help="Decode files larger than this many MB one mesh at a time, "
+                        "keeping a single mesh in memory; they are decoded in the main process and not cached (default: never)")
+    parser.add_argument("--lod", type=lod_choice, default=None, help="Only convert one LOD of every part: highest (most detailed), "
+                        "lowest (least detailed) or a level number (default: every LOD)")
+    parser.add_argument("--cache", default="", help="Directory of the decoded model cache (default: no cache)")
+    parser.add_argument("--cache-size", type=int, default=1024, help="Model cache size limit in MB (default: 1024)")
+    parser.add_argument("--proxy-size", type=int, default=0, help="Use proxy textures of at most this many pixels (default: full resolution)")
+    parser.add_argument("--no-shared-meshes", action="store_true", help="Give every mesh its own mesh data, even when identical to another one")
+    parser.add_argument("--trace-memory", action="store_true", help="Record the peak Python memory of every stage in the report")
+    parser.add_argument("--trace", action="store_true", help="Log every decoded element (slow, for debugging the parser)")
+    parser.add_argument("--link-shader", action="store_true", help="Link the shader from the addon's shader.blend instead of appending it")
+    return parser.parse_args(argv)
+
+def find_model_files(input_dir, pattern):
+    file_paths = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if fnmatch.fnmatch(file, pattern):
+                file_paths.append(os.path.join(root, file))
+    return file_paths
+
+def load_manifest(manifest_path):
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    return {'version': MANIFEST_VERSION, 'files': {}}
+
+def save_manifest(manifest, manifest_path):
+    # Written after every file, atomically, so a crash never leaves it half written
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temp_path, manifest_path)
+
+def file_stamp(file_path):
+    stat = os.stat(file_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def needs_conversion(entry, file_path, retry_failed):
+    if entry is None or entry.get('stamp') != file_stamp(file_path):
+        return True
+    if entry['status'] == 'done':
+        return not os.path.exists(entry['output'])
+    return retry_failed
+
+def output_path_for(file_path, input_dir, output_dir):
+    relative_path = os.path.relpath(file_path, input_dir)
+    return os.path.join(output_dir, relative_path + '.blend')
+
+def convert_model(model, name, output_path, textures, args, file_telemetry, nodes=None):
+    from . import model_importer, material_importer
+
+    # Every model goes into its own empty file
+    bpy.ops.wm.read_homefile(use_empty=True)
+    model_importer.import_model(model, name, file_telemetry, not args.no_shared_meshes, nodes, args.threads)
+    material_importer.import_materials(model, textures, args.link_shader, file_telemetry, args.proxy_size)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    bpy.ops.wm.save_as_mainfile(filepath=output_path, check_existing=False)
+
+def print_summary(results):
+    done = [r for r in results if r['status'] == 'done']
+    parsed = [r for r in results if r['status'] == 'parsed']
+    failed = [r for r in results if r['status'] == 'failed']
+    for result in failed:
+        print(f"FAILED {result['file']}: {result['error']}")
+    total = sum(r.get('parse_seconds', 0) + r.get('build_seconds', 0) for r in results)
+    print(f"{len(done)} converted, {len(parsed)} parsed, {len(failed)} failed, {total:.1f}s of work")
+
+def run(args):
+    input_dir = os.path.abspath(args.input_dir)
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = args.manifest or os.path.join(output_dir, 'manifest.json')
+    report_path = args.report or os.path.join(output_dir, 'report.json')
+
+    manifest = load_manifest(manifest_path)
+    entries = manifest['files']
+
+    # Files still marked as started were being built when an earlier run crashed
+    for entry in entries.values():
+        if entry['status'] == 'started':
+            entry['status'] = 'failed'
+            entry['error'] = "Crashed during conversion"
+
+    file_paths = []
+    for file_path in find_model_files(input_dir, args.pattern):
+        key = os.path.relpath(file_path, input_dir)
+        if needs_conversion(entries.get(key), file_path, args.retry_failed):
+            file_paths.append(file_path)
+    print(f"{len(file_paths)} files to convert in {input_dir}")
+
+    textures = None
+    if bpy is not None:
+        from . import material_importer
+        textures = material_importer.load_texture_index(args.textures)
+
+    selection = None
+    if args.nodes or args.lod is not None:
+        selection = model_parser.NodeSelection(patterns=tuple(args.nodes), lod=args.lod)
+    cache = model_cache.ModelCache(os.path.abspath(args.cache), args.cache_size * 1024 * 1024) if args.cache else None
+
+    # Files above the streaming size are decoded last, in this process, while they are built
+    stream_bytes = args.stream_size * 1024 * 1024
+    streamed = {file_path for file_path in file_paths if stream_bytes and os.path.getsize(file_path) > stream_bytes}
+    parsed = parse_pool.parse_files([file_path for file_path in file_paths if file_path not in streamed], args.workers,
+                                    selection, cache, args.trace_memory)
+    stream_results = (parse_pool.stream_file(file_path, args.trace_memory) for file_path in file_paths if file_path in streamed)
+
+    results = []
+    started = time.perf_counter()
+    for file_path, model, error, file_telemetry in itertools.chain(parsed, stream_results):
+        key = os.path.relpath(file_path, input_dir)
+        result = {'file': key}
+        results.append(result)
+
+        nodes = None
+        if error is None and file_path in streamed:
+            nodes = parse_pool.stream_nodes(file_path, model, selection, file_telemetry)
+            if bpy is None:
+                # Nothing to build, decode the meshes to check them
+                for _ in nodes:
+                    pass
+
+        if model is not None and model.error:
+            if not model.nodes:
+                error = model.error
+            else:
+                result['warning'] = model.error
+
+        if error is not None:
+            result.update(status='failed', error=f"Parse error: {error}")
+        elif bpy is None:
+            result.update(status='parsed', nodes=len(model.nodes))
+        else:
+            output_path = output_path_for(file_path, input_dir, output_dir)
+            entries[key] = {'status': 'started', 'stamp': file_stamp(file_path), 'output': output_path}
+            save_manifest(manifest, manifest_path)
+
+            build_started = time.perf_counter()
+            try:
+                convert_model(model, os.path.basename(file_path), output_path, textures, args, file_telemetry, nodes)
+                result.update(status='done', output=output_path)
+            except Exception as e:
+                result.update(status='failed', error=f"Build error: {e}")
+            result['build_seconds'] = round(time.perf_counter() - build_started, 3)
+        # Streamed files are decoded during the build, part of it is parse time
+        result['parse_seconds'] = round(file_telemetry.stages['parse']['seconds'], 3)
+        result['stages'] = file_telemetry.stages
+
+        if bpy is not None:
+            entries[key] = dict(result, stamp=file_stamp(file_path), output=result.get('output', ''))
+            save_manifest(manifest, manifest_path)
+
+    report = {
+        'input_dir': input_dir,
+        'output_dir': output_dir,
+        'wall_seconds': round(time.perf_counter() - started, 3),
+        'files': results
+    }
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    print_summary(results)
+    print(f"Report written to {report_path}")
+    return 1 if any(r['status'] == 'failed' for r in results) else 0
+
+def main(argv=None):
+    if argv is None:
+        # Blender passes the script's own arguments after '--'
+        argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    args = parse_args(argv)
+    logs.configure_logging(args.trace)
+    return run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+# Proxies are smaller copies of a DDS texture that start at a lower level of
+# its mip chain. The mip data is copied as is, nothing is decoded or encoded.
+
+DDS_MAGIC = b'DDS '
+HEADER_SIZE = 128
+DX10_HEADER_SIZE = 20
+
+DDSD_PITCH = 0x8
+DDSD_MIPMAPCOUNT = 0x20000
+DDSD_LINEARSIZE = 0x80000
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+DDPF_LUMINANCE = 0x20000
+DDSCAPS2_CUBEMAP = 0x200
+DDSCAPS2_VOLUME = 0x200000
+DX10_MISC_TEXTURECUBE = 0x4
+
+# Bytes per 4x4 block of the block compressed formats
+FOURCC_BLOCK_SIZES = {
+    b'DXT1': 8, b'DXT2': 16, b'DXT3': 16, b'DXT4': 16, b'DXT5': 16,
+    b'ATI1': 8, b'BC4U': 8, b'BC4S': 8, b'ATI2': 16, b'BC5U': 16, b'BC5S': 16
+}
+
+DXGI_BLOCK_SIZES = {}
+for first, last, size in ((70, 72, 8), (73, 78, 16), (79, 81, 8), (82, 84, 16), (94, 99, 16)):
+    for dxgi_format in range(first, last + 1):
+        DXGI_BLOCK_SIZES[dxgi_format] = size
+
+# Bytes per pixel of the uncompressed DXGI formats
+DXGI_PIXEL_SIZES = {}
+for first, last, size in ((1, 4, 16), (9, 14, 8), (27, 32, 4), (33, 38, 4), (48, 52, 2), (60, 65, 1), (87, 88, 4), (90, 93, 4)):
+    for dxgi_format in range(first, last + 1):
+        DXGI_PIXEL_SIZES[dxgi_format] = size
+
+def level_size(width, height, block_size, pixel_size):
+    if block_size:
+        return max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * block_size
+    return width * height * pixel_size
+
+def read_layout(header):
+    """Return (data offset, width, height, block size, pixel size, level count) of a DDS header.
+
+    None for files that are not plain 2D textures with a mip chain in a
+    format whose level sizes are known.
+    """
+    if len(header) < HEADER_SIZE or header[:4] != DDS_MAGIC:
+        return None
+    flags, height, width = struct.unpack_from('<III', header, 8)
+    (level_count,) = struct.unpack_from('<I', header, 28)
+    pf_flags, fourcc, bit_count = struct.unpack_from('<I4sI', header, 80)
+    (caps2,) = struct.unpack_from('<I', header, 112)
+
+    if caps2 & (DDSCAPS2_CUBEMAP | DDSCAPS2_VOLUME) or not flags & DDSD_MIPMAPCOUNT or level_count < 2:
+        return None
+
+    offset = HEADER_SIZE
+    block_size = pixel_size = 0
+    if pf_flags & DDPF_FOURCC and fourcc == b'DX10':
+        if len(header) < HEADER_SIZE + DX10_HEADER_SIZE:
+            return None
+        dxgi_format, dimension, misc_flag, array_size = struct.unpack_from('<IIII', header, HEADER_SIZE)
+        # Only single 2D textures
+        if dimension != 3 or misc_flag & DX10_MISC_TEXTURECUBE or array_size != 1:
+            return None
+        block_size = DXGI_BLOCK_SIZES.get(dxgi_format, 0)
+        pixel_size = DXGI_PIXEL_SIZES.get(dxgi_format, 0)
+        offset += DX10_HEADER_SIZE
+    elif pf_flags & DDPF_FOURCC:
+        block_size = FOURCC_BLOCK_SIZES.get(fourcc, 0)
+    elif pf_flags & (DDPF_RGB | DDPF_LUMINANCE) and bit_count % 8 == 0:
+        pixel_size = bit_count // 8
+
+    if not block_size and not pixel_size:
+        return None
+    return offset, width, height, block_size, pixel_size, level_count
+
+def proxy_level(width, height, level_count, max_size):
+    # The first level that fits max_size, or the smallest one there is
+    level = 0
+    while level < level_count - 1 and max(width >> level, height >> level) > max_size:
+        level += 1
+    return level
+
+def write_proxy(source_path, proxy_path, max_size):
+    """Write the mip chain of source_path from the first level that fits max_size to proxy_path.
+
+    Returns False when the texture has no smaller level or cannot be split.
+    """
+    with open(source_path, 'rb') as f:
+        header = f.read(HEADER_SIZE + DX10_HEADER_SIZE)
+        layout = read_layout(header)
+        if layout is None:
+            return False
+        data_offset, width, height, block_size, pixel_size, level_count = layout
+        header = bytearray(header[:data_offset])
+
+        level = proxy_level(width, height, level_count, max_size)
+        if level == 0:
+            return False
+        offset = data_offset
+        for skipped in range(level):
+            offset += level_size(max(1, width >> skipped), max(1, height >> skipped), block_size, pixel_size)
+        remaining = sum(level_size(max(1, width >> kept), max(1, height >> kept), block_size, pixel_size)
+                        for kept in range(level, level_count))
+
+        f.seek(offset)
+        data = f.read(remaining)
+        if len(data) != remaining:
+            logger.warning("Mip chain of %s is shorter than its header says", source_path)
+            return False
+
+    proxy_width, proxy_height = max(1, width >> level), max(1, height >> level)
+    struct.pack_into('<II', header, 12, proxy_height, proxy_width)
+    flags = struct.unpack_from('<I', header, 8)[0]
+    if flags & DDSD_LINEARSIZE:
+        struct.pack_into('<I', header, 20, level_size(proxy_width, proxy_height, block_size, pixel_size))
+    elif flags & DDSD_PITCH:
+        struct.pack_into('<I', header, 20, proxy_width * pixel_size)
+    struct.pack_into('<I', header, 28, level_count - level)
+
+    temp_path = f'{proxy_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(data)
+    os.replace(temp_path, proxy_path)
+    return True
+
+def get_proxy(texture_path, max_size, proxy_dir):
+    """Return the path of a proxy of texture_path no larger than max_size, creating it if needed.
+
+    Returns None when the texture is already small enough or has no usable
+    mip chain, the full texture is used then.
+    """
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(texture_path)).encode()).hexdigest()[:16]
+    proxy_path = os.path.join(proxy_dir, f"{digest}_{max_size}_{os.path.basename(texture_path)}")
+    try:
+        # Proxies older than their texture are written again
+        if os.path.getmtime(proxy_path) >= os.path.getmtime(texture_path):
+            return proxy_path
+    except OSError:
+        pass
+
+    try:
+        if write_proxy(texture_path, proxy_path, max_size):
+            return proxy_path
+    except OSError as e:
+        logger.warning("Could not write a proxy of %s: %s", texture_path, e)
+    return None
@@ -0,0 +1,184 @@
+import collections
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+
+# Blender-independent preparation of decoded meshes. Everything here works on
+# NumPy arrays only, model_importer hands the results to bpy.
+
+def decode_normals(normal_values):
+    normals = normal_values[:, :3] / 255.0 * 2.0 - 1.0
+    return normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+def mesh_columns(mesh):
+    vertices = np.ascontiguousarray(mesh.vertices.get("position", np.zeros((0, 3))), dtype=np.float32)
+    vertex_count = len(vertices)
+
+    uvs = np.array(mesh.vertices.get("uv", np.zeros((vertex_count, 2))), dtype=np.float32)
+    uvs[:, 1] = 1 - uvs[:, 1]
+
+    normals = decode_normals(mesh.vertices.get("normal", np.full((vertex_count, 4), 128))).astype(np.float32)
+    weights = mesh.vertices.get("weight", np.zeros((vertex_count, 4), dtype=np.int8))
+    links = mesh.vertices.get("link", np.zeros((vertex_count, 4), dtype=np.uint8))
+
+    return vertices, uvs, normals, weights, links
+
+def bone_rest_matrices(matrices, parents):
+    """Return the (N, 4, 4) rest matrices of bones from their (N, 4, 4) file matrices and parent indices.
+
+    File matrices have their translation in the last row, the results have it
+    in the last column like mathutils matrices. The 3x3 rotation block is
+    copied as it is, not transposed, which is how bones were always imported.
+    A bone keeps that rotation and is placed at its translation plus those of
+    all its ancestors. parents holds the index of each bone's parent, or -1.
+    """
+    matrices = np.asarray(matrices, dtype=np.float64)
+    parents = np.asarray(parents, dtype=np.int64)
+    local = matrices[:, 3, :3]
+
+    # Walk up one generation per pass, every bone at once
+    translations = local.copy()
+    ancestors = parents.copy()
+    while (ancestors >= 0).any():
+        linked = ancestors >= 0
+        translations[linked] += local[ancestors[linked]]
+        ancestors[linked] = parents[ancestors[linked]]
+
+    rest = np.tile(np.eye(4), (len(matrices), 1, 1))
+    rest[:, :3, :3] = matrices[:, :3, :3]
+    rest[:, :3, 3] = translations
+    return rest
+
+def valid_triangles(triangles, vertex_count):
+    return (triangles < vertex_count).all(axis=1)
+
+def weight_buckets(weights, links, link_indices):
+    """Group the (V, 4) weight/link influences into (link, weight byte, vertex ids) buckets.
+
+    Zero weights and links outside link_indices are dropped. A link repeated
+    within one vertex keeps its last weight.
+    """
+    vertex_ids = np.repeat(np.arange(len(weights), dtype=np.int64), 4)
+    weights = weights.astype(np.int64).ravel()
+    links = links.astype(np.int64).ravel()
+
+    mask = (weights > 0) & np.isin(links, list(link_indices))
+    vertex_ids, weights, links = vertex_ids[mask], weights[mask], links[mask]
+    if not len(vertex_ids):
+        return []
+
+    pair_keys = vertex_ids * 256 + links
+    _, last = np.unique(pair_keys[::-1], return_index=True)
+    keep = len(pair_keys) - 1 - last
+    vertex_ids, weights, links = vertex_ids[keep], weights[keep], links[keep]
+
+    bucket_keys = links * 256 + weights
+    order = np.argsort(bucket_keys, kind='stable')
+    splits = np.flatnonzero(np.diff(bucket_keys[order])) + 1
+    return [(int(links[bucket[0]]), int(weights[bucket[0]]), vertex_ids[bucket]) for bucket in np.split(order, splits)]
+
+def material_slots(materials, submeshes, polygon_count):
+    """Return the distinct material names in slot order and the per-polygon slot indices."""
+    material_indices = np.zeros(polygon_count, dtype=np.int32)
+    slots = {}
+    for material_index, triangle_offset, triangle_count, _, _ in submeshes.tolist():
+        if not 0 <= material_index < len(materials):
+            continue
+
+        mat_name = materials[material_index]
+        slots.setdefault(mat_name, len(slots))
+        triangle_offset = max(triangle_offset, 0)
+        material_indices[triangle_offset:triangle_offset + triangle_count] = slots[mat_name]
+
+    return list(slots), material_indices
+
+def mesh_key(arrays, extra=()):
+    """Hash the arrays a mesh datablock is built from, plus any other values it depends on.
+
+    Meshes with the same key are identical and can share one datablock.
+    """
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.data)
+    digest.update(repr(extra).encode())
+    return digest.hexdigest()
+
+@dataclass
+class PreparedMesh:
+    """Everything model_importer needs to build a mesh, ready to hand to bpy."""
+    vertices: np.ndarray
+    uvs: np.ndarray
+    normals: np.ndarray
+    triangles: np.ndarray
+    # Triangles dropped for pointing past the last vertex
+    invalid: np.ndarray
+    slot_names: list
+    material_indices: np.ndarray
+    # (vertex group index, node id) of the linked nodes that are bones
+    group_links: list
+    weight_buckets: list
+    # Geometry hash, None when meshes are not shared
+    key: str = None
+
+def prepare_mesh(mesh, bone_ids, share=True):
+    """Convert a decoded mesh's vertex bytes into the arrays its datablock is built from.
+
+    Only NumPy and hashlib work, which release the GIL, so several meshes can
+    be prepared in threads at once.
+    """
+    vertices, uvs, normals, weights, links = mesh_columns(mesh)
+
+    valid = valid_triangles(mesh.triangles, len(vertices))
+    invalid = mesh.triangles[~valid]
+    triangles = mesh.triangles[valid]
+
+    slot_names, material_indices = material_slots(mesh.materials, mesh.submeshes, len(triangles))
+    group_links = [(index, node_id) for index, node_id in enumerate(mesh.linked_nodes.tolist()) if node_id in bone_ids]
+    group_indices = [index for index, _ in group_links]
+
+    key = None
+    if share:
+        # Vertex group indices are stored in the mesh, so they are part of its identity
+        key = mesh_key((vertices, uvs, normals, weights, links, triangles, material_indices), (slot_names, group_indices))
+
+    return PreparedMesh(vertices, uvs, normals, triangles, invalid, slot_names, material_indices, group_links,
+                        weight_buckets(weights, links, group_indices), key)
+
+def default_thread_count():
+    return os.cpu_count() or 1
+
+def prepare_meshes(nodes, bone_ids, share=True, threads=0):
+    """Yield (node, PreparedMesh) for every decoded mesh of nodes, in node order.
+
+    Up to threads meshes (default: one per core) are prepared ahead of the one
+    being consumed, so the caller builds one mesh while the next ones are
+    converted. nodes can be a stream, it is only read that far ahead.
+    """
+    threads = threads or default_thread_count()
+    nodes = (node for node in nodes if node.mesh is not None and node.mesh.decoded)
+    if threads <= 1:
+        for node in nodes:
+            yield node, prepare_mesh(node.mesh, bone_ids, share)
+        return
+
+    pending = collections.deque()
+
+    def next_result():
+        # Popped in a helper so no local of the generator keeps a node the caller is done with
+        node, future = pending.popleft()
+        return node, future.result()
+
+    executor = ThreadPoolExecutor(max_workers=threads)
+    try:
+        for node in nodes:
+            pending.append((node, executor.submit(prepare_mesh, node.mesh, bone_ids, share)))
+            if len(pending) > threads:
+                yield next_result()
+        while pending:
+            yield next_result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,22 @@
+import logging
+
+# Parent of the loggers of every module in the addon
+logger = logging.getLogger(__package__)
+
+def configure_logging(trace=False):
+    """Send the addon's messages to the console.
+
+    By default only summaries, warnings and errors are shown. With trace set,
+    every decoded element, vertex group and material connection is logged as
+    well, which is slow on big models.
+    """
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        # Keep the messages out of any handlers the host installed on the root logger
+        logger.propagate = False
+    logger.setLevel(logging.DEBUG if trace else logging.INFO)
+
+def tracing():
+    return logger.isEnabledFor(logging.DEBUG)
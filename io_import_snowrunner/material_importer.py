@@ -1,102 +1,221 @@
 import bpy
+import json
+import logging
 import os
-import re
-import fnmatch
-
-def append_shader(shader_blend_path, shader_name):
-    with bpy.data.libraries.load(shader_blend_path, link=False) as (data_from, data_to):
-        if shader_name in data_from.node_groups:
-            data_to.node_groups.append(shader_name)
-
-def find_texture(base_path, texture_name):
-    for root, dirs, files in os.walk(base_path):
-        for file in files:
-            if fnmatch.fnmatch(file, '*' + texture_name):
-                return os.path.join(root, file)
-    return None
-
-def import_materials(material_data_file_path, base_path):
-    shader_name = "Snowrunner Shader"
-    shader_blend_path = os.path.join(os.path.dirname(__file__), 'shader.blend')
-
-    # Append the shader if it's not already in the file
-    if shader_name not in bpy.data.node_groups:
-        append_shader(shader_blend_path, shader_name)
-
-    with open(material_data_file_path, 'r') as file:
-        data = file.read()
-
-    materials = re.findall(r'<Material(.*?)\/>', data, re.DOTALL)
+from . import dds_proxy, shader_library, telemetry, texture_index
 
-    for material_data in materials:
-        material_props = dict(re.findall(r'(\w+)="([^"]+)"', material_data))
-        material_name = material_props.get('Name')
-        if not material_name:
-            continue
+logger = logging.getLogger(__name__)
 
-        print(f"Processing material: {material_name}")
+# The <Material> attributes an imported material was built from
+SIGNATURE_PROPERTY = "snowrunner_material"
 
-        material_node = bpy.data.materials.get(material_name)
-        if material_node is None:
-            material_node = bpy.data.materials.new(name=material_name)
+# Full resolution texture path of images loaded from a proxy
+FULL_RESOLUTION_PROPERTY = "snowrunner_full_resolution"
 
-        material_node.use_nodes = True
-        nodes = material_node.node_tree.nodes
-        links = material_node.node_tree.links
+def load_texture_index(base_path):
+    # Persist the index with the addon's user data so later sessions start warm
+    index_dir = bpy.utils.user_resource('DATAFILES', path="io_import_snowrunner", create=True)
+    return texture_index.get_texture_index(base_path, index_dir)
 
-        for node in nodes:
-            nodes.remove(node)
+def texture_source(texture_path, proxy_size):
+    """Return the path to load for texture_path, a proxy of at most proxy_size pixels when that is set."""
+    if not proxy_size:
+        return texture_path
+    proxy_dir = bpy.utils.user_resource('DATAFILES', path="io_import_snowrunner/texture_proxies", create=True)
+    return dds_proxy.get_proxy(texture_path, proxy_size, proxy_dir) or texture_path
 
-        shader_node = nodes.new(type='ShaderNodeGroup')
-        shader_node.node_tree = bpy.data.node_groups.get(shader_name)
-
-        if shader_node.node_tree is None:
-            print(f"Error: Shader '{shader_name}' not found")
-            continue
+def image_key(texture_path, colorspace, alpha_mode):
+    return (os.path.normcase(os.path.abspath(texture_path)), colorspace, alpha_mode)
 
-        output_node = nodes.new(type='ShaderNodeOutputMaterial')
-        links.new(shader_node.outputs['BSDF'], output_node.inputs['Surface'])
+# Image datablock names keyed by (absolute path, colorspace, alpha mode). Only
+# names are kept so the cache survives undo and file loads, where datablock
+# references would go stale.
+_image_names = {}
 
-        shader_node.location = (0, 0)
-        output_node.location = (200, 0)
-
-        for key, value in material_props.items():
-            if key.endswith('Map'):
-                texture_name = value.replace('/', '_').replace('\\', '_').replace('.tga', '.dds')
-                texture_path = find_texture(base_path, texture_name)
-                if not texture_path:
-                    print(f"Error: File not found for texture name: {texture_name}")
-                    continue
+def find_loaded_image(key):
+    name = _image_names.get(key)
+    image = bpy.data.images.get(name) if name else None
+    if image is not None and image_key(bpy.path.abspath(image.filepath), image.colorspace_settings.name, image.alpha_mode) == key:
+        return image
+    return None
 
+def index_loaded_images():
+    """Rebuild the image names from the images in the file, e.g. from an earlier session."""
+    _image_names.clear()
+    for existing in bpy.data.images:
+        if existing.filepath:
+            existing_key = image_key(bpy.path.abspath(existing.filepath), existing.colorspace_settings.name, existing.alpha_mode)
+            _image_names.setdefault(existing_key, existing.name)
+
+def load_image(texture_path, colorspace, alpha_mode, full_path=None):
+    """Return an image for texture_path with the given settings, loading it only once.
+
+    full_path is the full resolution texture when texture_path is a proxy.
+    Images already in the file are found once index_loaded_images has run.
+    """
+    key = image_key(texture_path, colorspace, alpha_mode)
+    image = find_loaded_image(key)
+    if image is None:
+        image = bpy.data.images.load(texture_path)
+        image.colorspace_settings.name = colorspace
+        image.alpha_mode = alpha_mode
+        if full_path is not None and full_path != texture_path:
+            image[FULL_RESOLUTION_PROPERTY] = full_path
+        _image_names[key] = image.name
+
+    return image
+
+def material_signature(material_props, proxy_size=0):
+    if proxy_size:
+        # Rebuild materials when switching between proxies and full textures
+        material_props = dict(material_props, ProxySize=proxy_size)
+    return json.dumps(material_props, sort_keys=True)
+
+def is_up_to_date(material, signature, shader_group):
+    if material.get(SIGNATURE_PROPERTY) != signature or material.node_tree is None:
+        return False
+    shader_node = material.node_tree.nodes.get(shader_library.SHADER_NAME)
+    return shader_node is not None and shader_node.node_tree == shader_group
+
+def build_material(material_props, template, textures, file_telemetry, proxy_size=0):
+    material_name = material_props['Name']
+    material_node = template.copy()
+    material_node.use_fake_user = False
+    del material_node[shader_library.VERSION_PROPERTY]
+
+    nodes = material_node.node_tree.nodes
+    links = material_node.node_tree.links
+    shader_node = nodes[shader_library.SHADER_NAME]
+
+    for key, value in material_props.items():
+        if key.endswith('Map'):
+            texture_name = value.replace('/', '_').replace('\\', '_').replace('.tga', '.dds')
+            with file_telemetry.stage('textures', memory=False) as record:
+                texture_path = textures.find(texture_name)
+                record['count'] += 1
+            if not texture_path:
+                logger.warning("Texture not found for %s: %s", material_name, texture_name)
+                continue
+
+            # The template has a connected image node for every map input of the shader
+            tex_image = nodes.get(key)
+            if tex_image is None:
                 tex_image = nodes.new('ShaderNodeTexImage')
-                tex_image.image = bpy.data.images.load(texture_path)
+                tex_image.name = key
                 tex_image.label = key
-
-                if 'NormalMap' in key or 'ShadingMap' in key:
-                    tex_image.image.colorspace_settings.name = 'Non-Color'
-                else:
-                    tex_image.image.alpha_mode = 'CHANNEL_PACKED'
-
-                if key in shader_node.inputs:
-                    links.new(tex_image.outputs['Color'], shader_node.inputs[key])
-                    print(f"Connected {key} Color output to {shader_name} input")
-                    if key == 'AlbedoMap':
-                        if 'Blending' in material_props and material_props['Blending'] == 'alpha':
-                            links.new(tex_image.outputs['Alpha'], shader_node.inputs['AlbedoMapAlpha'])
-                            material_node.blend_method = 'BLEND'
-                            print(f"Set blending method to BLEND for {material_name} due to Blending='alpha'")
-                        elif 'AlphaKill' in material_props and material_props['AlphaKill'] == 'True':
-                            links.new(tex_image.outputs['Alpha'], shader_node.inputs['AlbedoMapAlpha'])
-                            material_node.blend_method = 'BLEND'
-                            print(f"Set blending method to BLEND for {material_name} due to AlphaKill='True'")
-
                 tex_image.location = (-200, len(nodes) * -200)
 
-        # Ensure material blend method is set if blending or alpha kill is required
-        if ('Blending' in material_props and material_props['Blending'] == 'alpha') or \
-           ('AlphaKill' in material_props and material_props['AlphaKill'] == 'True'):
-            material_node.blend_method = 'BLEND'
-            print(f"Ensured blend method is BLEND for {material_name}")
+            source_path = texture_source(texture_path, proxy_size)
+            if 'NormalMap' in key or 'ShadingMap' in key:
+                tex_image.image = load_image(source_path, 'Non-Color', 'STRAIGHT', texture_path)
+            else:
+                tex_image.image = load_image(source_path, 'sRGB', 'CHANNEL_PACKED', texture_path)
+
+            if key == 'AlbedoMap' and key in shader_node.inputs:
+                if 'Blending' in material_props and material_props['Blending'] == 'alpha':
+                    links.new(tex_image.outputs['Alpha'], shader_node.inputs['AlbedoMapAlpha'])
+                    logger.debug("Set blending method to BLEND for %s due to Blending='alpha'", material_name)
+                elif 'AlphaKill' in material_props and material_props['AlphaKill'] == 'True':
+                    links.new(tex_image.outputs['Alpha'], shader_node.inputs['AlbedoMapAlpha'])
+                    logger.debug("Set blending method to BLEND for %s due to AlphaKill='True'", material_name)
+
+    # Drop the template image nodes of maps this material does not use
+    for node in list(nodes):
+        if node.type == 'TEX_IMAGE' and node.image is None:
+            nodes.remove(node)
 
-    print("Material data imported successfully")
+    # Ensure material blend method is set if blending or alpha kill is required
+    if ('Blending' in material_props and material_props['Blending'] == 'alpha') or \
+       ('AlphaKill' in material_props and material_props['AlphaKill'] == 'True'):
+        material_node.blend_method = 'BLEND'
+
+    material_node[SIGNATURE_PROPERTY] = material_signature(material_props, proxy_size)
+    return material_node
+
+def import_materials(model, textures, link_shader=False, file_telemetry=None, proxy_size=0):
+    """Build the materials of the model's XML header.
+
+    With proxy_size set, textures are loaded from proxies of at most that
+    many pixels (see dds_proxy), use_full_resolution swaps them back. The
+    'materials' stage, and the texture lookups within it as 'textures', are
+    recorded in file_telemetry when given.
+    """
+    for _ in import_material_steps(model, textures, link_shader, file_telemetry, proxy_size):
+        pass
+
+def import_material_steps(model, textures, link_shader=False, file_telemetry=None, proxy_size=0):
+    """Generator version of import_materials, yielding after every material."""
+    if file_telemetry is None:
+        file_telemetry = telemetry.FileTelemetry('')
+
+    with file_telemetry.stage('materials'):
+        shader_group = shader_library.get_shader_group(link=link_shader)
+        if shader_group is None:
+            logger.error("Shader '%s' not found", shader_library.SHADER_NAME)
+            return
+
+        template = shader_library.get_template_material(shader_group)
+        # Once per import rather than on every image miss, loaded images are added as they come
+        index_loaded_images()
+
+    meshes = [node.mesh for node in model.nodes if node.mesh is not None]
+    used = None
+    if any(not mesh.decoded for mesh in meshes):
+        # Only build the materials of the meshes picked for a selective import
+        used = {name for mesh in meshes if mesh.decoded for name in mesh.materials}
+
+    built = 0
+    for material_props in model.materials:
+        material_name = material_props.get('Name')
+        if not material_name or (used is not None and material_name not in used):
+            continue
+
+        with file_telemetry.stage('materials') as record:
+            existing = bpy.data.materials.get(material_name)
+            if existing is not None and is_up_to_date(existing, material_signature(material_props, proxy_size), shader_group):
+                logger.debug("Material %s is up to date", material_name)
+                continue
+
+            logger.debug("Processing material: %s", material_name)
+            material_node = build_material(material_props, template, textures, file_telemetry, proxy_size)
+
+            # Swap the new material in for the existing one, including the empty
+            # slots created for it by the model import
+            if existing is not None:
+                existing.user_remap(material_node)
+                bpy.data.materials.remove(existing)
+            material_node.name = material_name
+            record['count'] += 1
+            built += 1
+        yield
+
+    textures.save()
+    logger.info("Built %d materials", built)
+
+def use_full_resolution():
+    """Point every image loaded from a proxy back at its full resolution texture, returning how many were switched.
+
+    A proxy is swapped for the full resolution image when that is already
+    loaded. Proxies nothing uses any more are removed instead.
+    """
+    index_loaded_images()
+    count = 0
+    for image in [image for image in bpy.data.images if image.get(FULL_RESOLUTION_PROPERTY)]:
+        if image.users == 0:
+            bpy.data.images.remove(image)
+            continue
 
+        full_path = image[FULL_RESOLUTION_PROPERTY]
+        key = image_key(full_path, image.colorspace_settings.name, image.alpha_mode)
+        full_image = find_loaded_image(key)
+        if full_image is not None:
+            image.user_remap(full_image)
+            bpy.data.images.remove(image)
+        else:
+            image.filepath = full_path
+            image.reload()
+            image.name = os.path.basename(full_path)
+            del image[FULL_RESOLUTION_PROPERTY]
+            _image_names[key] = image.name
+        count += 1
+    return count
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import numpy as np
+from . import model_parser
+
+logger = logging.getLogger(__name__)
+
+ARRAY_ALIGNMENT = 16
+
+# Temporary and headerless data files older than this were left by a store
+# that never finished; younger ones may still be written by another process
+STALE_SECONDS = 60 * 60
+
+def store_array(f, array):
+    """Append array to the open data file and return its [offset, dtype, shape] entry."""
+    array = np.ascontiguousarray(array)
+    offset = f.tell()
+    padding = -offset % ARRAY_ALIGNMENT
+    f.write(b'\0' * padding)
+    f.write(array.tobytes())
+    return [offset + padding, array.dtype.str, list(array.shape)]
+
+def load_array(data, entry):
+    offset, dtype, shape = entry
+    array, _ = model_parser.read_array(data, offset, dtype, tuple(shape))
+    return array
+
+def mesh_entry(mesh, f):
+    return {
+        'name': mesh.name,
+        'vertex_count': mesh.vertex_count,
+        'triangle_count': mesh.triangle_count,
+        'materials': mesh.materials,
+        'link_matrices': store_array(f, mesh.link_matrices),
+        'linked_nodes': store_array(f, mesh.linked_nodes),
+        'submeshes': store_array(f, mesh.submeshes),
+        'submesh_indices': [store_array(f, indices) for indices in mesh.submesh_indices],
+        'data_blocks': [list(block) for block in mesh.data_blocks],
+        'vertices': {name: store_array(f, column) for name, column in mesh.vertices.items()},
+        'triangles': store_array(f, mesh.triangles),
+        'bounds': mesh.bounds,
+        'extent': mesh.extent
+    }
+
+def load_mesh(entry, data):
+    return model_parser.Mesh(
+        entry['name'], entry['vertex_count'], entry['triangle_count'],
+        materials=entry['materials'],
+        link_matrices=load_array(data, entry['link_matrices']),
+        linked_nodes=load_array(data, entry['linked_nodes']),
+        submeshes=load_array(data, entry['submeshes']),
+        submesh_indices=[load_array(data, indices) for indices in entry['submesh_indices']],
+        data_blocks=[tuple(block) for block in entry['data_blocks']],
+        vertices={name: load_array(data, column) for name, column in entry['vertices'].items()},
+        triangles=load_array(data, entry['triangles']),
+        bounds=tuple(tuple(corner) for corner in entry['bounds']),
+        extent=tuple(entry['extent'])
+    )
+
+def apply_selection(model, selection):
+    # Drop the geometry of the meshes a selective import leaves out, as parse_data would
+    for i, node in enumerate(model.nodes):
+        mesh = node.mesh
+        if mesh is not None and not selection(i, node.name, mesh.name):
+            mesh.vertices = {}
+            mesh.triangles = np.zeros((0, 3), dtype=np.uint16)
+            mesh.decoded = False
+
+class ModelCache:
+    """Directory of decoded models keyed by file content and parser version.
+
+    Every entry is a JSON header with the model's scalars and array layout
+    plus one data file with all arrays back to back. A hit maps the data file,
+    so the arrays of the returned model are views into it. The least recently
+    used entries are removed once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, data):
+        digest = hashlib.sha1(data)
+        digest.update(f"parser {model_parser.PARSER_VERSION}".encode())
+        return digest.hexdigest()
+
+    def paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.bin'
+
+    def load(self, key):
+        header_path, data_path = self.paths(key)
+        try:
+            with open(header_path, 'r') as f:
+                header = json.load(f)
+            data = model_parser.map_file(data_path)
+            model = model_parser.Model(header['xml'], tuple(tuple(corner) for corner in header['bounds']),
+                                       materials=header['materials'])
+            for entry in header['nodes']:
+                node = model_parser.Node(entry['parent_id'], entry['node_id'], entry['link_in_count'], entry['name'],
+                                         load_array(data, entry['matrix']), extent=tuple(entry['extent']))
+                if entry['mesh'] is not None:
+                    node.mesh = load_mesh(entry['mesh'], data)
+                model.nodes.append(node)
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing, evicted or half written entries are just misses
+            return None
+
+        # The header's mtime is the entry's last use
+        try:
+            os.utime(header_path)
+        except OSError:
+            pass
+        return model
+
+    def store(self, key, model):
+        os.makedirs(self.directory, exist_ok=True)
+        header_path, data_path = self.paths(key)
+        # Unique temporary names, workers of the same import may store the same file
+        suffix = f'.{os.getpid()}.tmp'
+
+        with open(data_path + suffix, 'wb') as f:
+            nodes = []
+            for node in model.nodes:
+                nodes.append({
+                    'parent_id': node.parent_id,
+                    'node_id': node.node_id,
+                    'link_in_count': node.link_in_count,
+                    'name': node.name,
+                    'matrix': store_array(f, node.matrix),
+                    'extent': node.extent,
+                    'mesh': mesh_entry(node.mesh, f) if node.mesh is not None else None
+                })
+        header = {
+            'xml': model.xml,
+            'bounds': model.bounds,
+            'materials': model.materials,
+            'nodes': nodes
+        }
+        with open(header_path + suffix, 'w') as f:
+            json.dump(header, f)
+
+        # The header goes in last, an entry without one is never read
+        os.replace(data_path + suffix, data_path)
+        os.replace(header_path + suffix, header_path)
+
+    def evict(self):
+        entries = []
+        total = 0
+        now = time.time()
+        for name in os.listdir(self.directory):
+            base, extension = os.path.splitext(name)
+            if extension == '.tmp' or (extension == '.bin' and not os.path.exists(self.paths(base)[0])):
+                path = os.path.join(self.directory, name)
+                try:
+                    if now - os.stat(path).st_mtime > STALE_SECONDS:
+                        os.remove(path)
+                except OSError:
+                    pass
+                continue
+            if extension != '.json':
+                continue
+            header_path, data_path = self.paths(name[:-5])
+            try:
+                used = os.stat(header_path).st_mtime
+                size = os.path.getsize(header_path) + os.path.getsize(data_path)
+            except OSError:
+                continue
+            entries.append((used, size, header_path, data_path))
+            total += size
+
+        entries.sort()
+        for used, size, header_path, data_path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(header_path)
+                os.remove(data_path)
+            except OSError:
+                # Still mapped by a model in use (Windows), try again next time
+                continue
+            total -= size
+
+    def parse(self, file_path, selection=None):
+        """Return the decoded model of file_path, from the cache when possible."""
+        key = self.key(model_parser.map_file(file_path))
+        model = self.load(key)
+        if model is not None:
+            logger.info("Loaded %s from the model cache", os.path.basename(file_path))
+            if isinstance(selection, model_parser.NodeSelection):
+                selection = selection.resolve(file_path, model)
+            if selection is not None:
+                apply_selection(model, selection)
+            return model
+
+        model = model_parser.parse_data(file_path, selection=selection)
+        # Only complete decodes are kept, they serve every later selection
+        if selection is None and not model.error:
+            try:
+                self.store(key, model)
+                self.evict()
+            except OSError as e:
+                logger.warning("Could not write the model cache entry for %s: %s", file_path, e)
+        return model
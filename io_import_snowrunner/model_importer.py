@@ -1,292 +1,270 @@
 import bpy
+import contextlib
+import logging
 import math
-import re
-import mathutils
-
-def parse_vector(vector_string):
-    return tuple(map(float, vector_string.strip('()').replace(';', '').split()))
-
-def parse_matrix(vector_strings):
-    matrix = []
-    for vector_string in vector_strings:
-        row = list(map(float, re.findall(r'[-+]?\d*\.\d+|\d+', vector_string)))
-        matrix.append(row)
-    
-    rotation_matrix = mathutils.Matrix((
-        (matrix[0][0], matrix[0][1], matrix[0][2]),
-        (matrix[1][0], matrix[1][1], matrix[1][2]),
-        (matrix[2][0], matrix[2][1], matrix[2][2])
-    ))
-    
-    translation = (matrix[3][1], matrix[3][2], matrix[3][3])
-    
-    full_matrix = rotation_matrix.to_4x4()
-    full_matrix.translation = translation
-    
-    return full_matrix
-
-def parse_vertex(vertex_string):
-    try:
-        position_match = re.search(r'position=\(([^)]+)\)', vertex_string)
-        uv_match = re.search(r'uv=\(([^)]+)\)', vertex_string)
-        normal_match = re.search(r'normal=\(([^)]+)\)', vertex_string)
-        weight_match = re.search(r'weight=\(([^)]+)\)', vertex_string)
-        link_match = re.search(r'link=\(([^)]+)\)', vertex_string)
-        
-        position = tuple(map(float, position_match.group(1).split(','))) if position_match else None
-        uv = tuple(map(float, uv_match.group(1).split(','))) if uv_match else (0.0, 0.0)
-        normal_values = tuple(int(n) for n in normal_match.group(1).split(',')) if normal_match else (128, 128, 128, 255)
-        weights = tuple(int(n) for n in weight_match.group(1).split(',')) if weight_match else (0, 0, 0, 0)
-        links = tuple(int(n) for n in link_match.group(1).split(',')) if link_match else (0, 0, 0, 0)
-
-        x = (normal_values[0] / 255.0) * 2.0 - 1.0
-        y = (normal_values[1] / 255.0) * 2.0 - 1.0
-        z = (normal_values[2] / 255.0) * 2.0 - 1.0
-        length = math.sqrt(x * x + y * y + z * z)
-        normal = (x / length, y / length, z / length)
-
-        return position, uv, normal, weights, links
-    except Exception as e:
-        print(f"Error parsing vertex: {vertex_string} - {e}")
-        return None, None, None, None, None
-
-def parse_face(face_string):
-    try:
-        parts = face_string.split('(')[1].split(')')[0].split(',')
-        face = tuple(int(part.split('=')[1]) for part in parts)
-        return face
-    except Exception as e:
-        print(f"Error parsing face: {face_string} - {e}")
-        return None
-
-def parse_material(material_string):
-    try:
-        name = material_string.split(': ')[1].strip()
-        return name
-    except Exception as e:
-        print(f"Error parsing material: {material_string} - {e}")
-        return None
-
-def parse_mesh_name(mesh_string):
-    try:
-        name = mesh_string.split('name=')[1].strip()
-        return name
-    except Exception as e:
-        print(f"Error parsing mesh name: {mesh_string} - {e}")
-        return None
-
-def parse_object_name(object_string):
-    try:
-        name = object_string.split('name=')[1].strip()
-        return name
-    except Exception as e:
-        print(f"Error parsing object name: {object_string} - {e}")
-        return None
-
-def parse_bone(bone_string):
-    try:
-        parent_id = int(re.search(r'parent_id=(-?\d+)', bone_string).group(1))
-        node_id = int(re.search(r'node_id=(\d+)', bone_string).group(1))
-        name_match = re.search(r'name=([^,]+)', bone_string)
-        name = name_match.group(1).strip() if name_match else None
-        return parent_id, node_id, name
-    except Exception as e:
-        print(f"Error parsing bone: {bone_string} - {e}")
-        return None, None, None
-
-def parse_submesh(submesh_string):
-    try:
-        material_index_match = re.search(r'Material Index: (\d+)', submesh_string)
-        triangle_range_match = re.search(r'From triangle (\d+) to triangle (\d+)', submesh_string)
-        vertex_range_match = re.search(r'From vertex (\d+) to vertex (\d+)', submesh_string)
-
-        if material_index_match and triangle_range_match and vertex_range_match:
-            material_index = int(material_index_match.group(1))
-            triangle_start = int(triangle_range_match.group(1))
-            triangle_end = int(triangle_range_match.group(2))
-            vertex_start = int(vertex_range_match.group(1))
-            vertex_end = int(vertex_range_match.group(2))
-            return material_index, triangle_start, triangle_end, vertex_start, vertex_end
-        else:
-            raise ValueError("Incomplete submesh data.")
-    except Exception as e:
-        print(f"Error parsing submesh: {submesh_string} - {e}")
-        return None, None, None, None, None
-
-def import_model(txt_file_path):
-    with open(txt_file_path, 'r') as file:
-        data = file.readlines()
-
-    objects = {}
-    current_object = None
-    current_mesh = None
-    bones = {}
-    vertex_groups = {}
-    node_id = None
-    linked_nodes = []
-
-    for line in data:
-        line = line.strip()
-        if line.startswith('Node:'):
-            parent_id, node_id, bone_name = parse_bone(line)
-            if bone_name is not None:
-                bones[node_id] = {
-                    "parent_id": parent_id,
-                    "name": bone_name,
-                    "matrix": []
-                }
-            object_name = parse_object_name(line)
-            current_object = {
-                "name": object_name,
-                "meshes": [],
-                "materials": {},
-                "submeshes": [],
-                "linked_nodes": []
-            }
-            objects[object_name] = current_object
-        elif line.startswith('Mesh:'):
-            mesh_name = parse_mesh_name(line)
-            current_mesh = {
-                "name": mesh_name,
-                "vertices": [],
-                "uvs": [],
-                "normals": [],
-                "faces": [],
-                "weights": [],
-                "links": []
-            }
-            current_object["meshes"].append(current_mesh)
-        elif line.startswith('Material:'):
-            material_name = parse_material(line)
-            if material_name:
-                if current_mesh["name"] not in current_object["materials"]:
-                    current_object["materials"][current_mesh["name"]] = []
-                current_object["materials"][current_mesh["name"]].append(material_name)
-        elif re.search(r'Submesh \d+ Data:', line):
-            material_index, triangle_start, triangle_end, vertex_start, vertex_end = parse_submesh(line)
-            if material_index is not None:
-                current_object["submeshes"].append({
-                    "material_index": material_index,
-                    "triangle_start": triangle_start,
-                    "triangle_end": triangle_end,
-                    "vertex_start": vertex_start,
-                    "vertex_end": vertex_end
-                })
-        elif line.startswith('Linked Node='):
-            linked_node_id = int(line.split('=')[1])
-            current_object["linked_nodes"].append(linked_node_id)
-        elif line.startswith('vertex:'):
-            position, uv, normal, weights, links = parse_vertex(line)
-            if position is not None:
-                current_mesh["vertices"].append(position)
-                current_mesh["uvs"].append((uv[0], 1 - uv[1]))
-                current_mesh["normals"].append(normal)
-                current_mesh["weights"].append(weights)
-                current_mesh["links"].append(links)
-        elif line.startswith('triangle:'):
-            face = parse_face(line)
-            if face is not None:
-                current_mesh["faces"].append(face)
-        elif line.startswith('vector4:'):
-            if node_id is not None and node_id in bones:
-                bones[node_id]["matrix"].append(line)
-
+import numpy as np
+from . import geometry, telemetry
+
+logger = logging.getLogger(__name__)
+
+# Geometry hash of imported meshes, identical meshes share one datablock
+MESH_KEY_PROPERTY = "snowrunner_mesh_key"
+
+def build_mesh(name, vertices, triangles, uvs, normals):
+    """Create a triangle mesh datablock from flat NumPy buffers.
+
+    vertices, uvs and normals are per vertex arrays and triangles is an (N, 3)
+    array of vertex indices. Everything is written through foreach_set, UVs
+    are expanded to face corners by indexing with the triangle array.
+    """
+    loop_vertices = np.ascontiguousarray(triangles, dtype=np.int32).ravel()
+    loop_count = len(loop_vertices)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", vertices.ravel())
+    mesh.loops.add(loop_count)
+    mesh.loops.foreach_set("vertex_index", loop_vertices)
+    mesh.polygons.add(len(triangles))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, loop_count, 3, dtype=np.int32))
+    mesh.update(calc_edges=True)
+
+    uv_layer = mesh.uv_layers.new(name='UVMap')
+    uv_layer.data.foreach_set("uv", uvs[loop_vertices].ravel())
+
+    mesh.normals_split_custom_set_from_vertices(normals)
+
+    return mesh
+
+def assign_vertex_weights(vertex_groups, buckets):
+    """Add the (link, weight byte, vertex ids) buckets of geometry.weight_buckets to the vertex groups keyed by link index.
+
+    Every bucket is written with a single VertexGroup.add call.
+    """
+    count = 0
+    for link, weight, vertex_ids in buckets:
+        vertex_groups[link].add(vertex_ids.tolist(), weight / 255.0, 'REPLACE')
+        count += len(vertex_ids)
+    return count
+
+def assign_materials(mesh, slot_names, material_indices):
+    """Fill the mesh's material slots and give every polygon its slot index."""
+    for mat_name in slot_names:
+        mat = bpy.data.materials.get(mat_name)
+        if not mat:
+            mat = bpy.data.materials.new(name=mat_name)
+        mesh.materials.append(mat)
+
+    if slot_names:
+        mesh.polygons.foreach_set("material_index", material_indices)
+
+def shared_meshes():
+    """Return the meshes imported so far, in this session or into the open file, keyed by geometry hash.
+
+    Meshes being edited and meshes linked from a library are left out.
+    """
+    return {mesh[MESH_KEY_PROPERTY]: mesh for mesh in bpy.data.meshes
+            if MESH_KEY_PROPERTY in mesh and not mesh.is_editmode and mesh.library is None}
+
+def is_unchanged(mesh, prepared):
+    """Return whether mesh still has the vertex positions and triangles of the geometry.PreparedMesh it was built from."""
+    if len(mesh.vertices) != len(prepared.vertices) or len(mesh.polygons) != len(prepared.triangles) \
+            or len(mesh.loops) != prepared.triangles.size:
+        return False
+    positions = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", positions)
+    loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    return np.array_equal(positions, np.asarray(prepared.vertices, dtype=np.float32).ravel()) \
+        and np.array_equal(loop_vertices, prepared.triangles.ravel())
+
+# bpy.data collections an import adds to
+DATA_COLLECTIONS = ('objects', 'meshes', 'armatures', 'materials', 'images', 'node_groups')
+
+def datablock_snapshot():
+    return {datablock.as_pointer() for collection in DATA_COLLECTIONS for datablock in getattr(bpy.data, collection)}
+
+def remove_created(snapshot):
+    """Remove every datablock added since snapshot was taken."""
+    created = [datablock for collection in DATA_COLLECTIONS for datablock in getattr(bpy.data, collection)
+               if datablock.as_pointer() not in snapshot]
+    bpy.data.batch_remove(created)
+    return len(created)
+
+def build_armature(bone_nodes):
+    """Create an armature object in the scene with a bone for each node.
+
+    The rest matrices are computed together in NumPy and written to all edit
+    bones with foreach_set. Edit bones only exist in edit mode, so the
+    armature goes through it once as the only selected, active object. The
+    previous active object and selection are restored afterwards.
+    """
     armature = bpy.data.armatures.new('Armature')
     armature_obj = bpy.data.objects.new('Armature', armature)
     bpy.context.scene.collection.objects.link(armature_obj)
-    bpy.context.view_layer.objects.active = armature_obj
-    bpy.ops.object.mode_set(mode='EDIT')
-
-    bone_objs = {}
-    for bone_id, bone_data in bones.items():
-        bone = armature.edit_bones.new(bone_data["name"])
-        if bone_data["parent_id"] in bone_objs:
-            bone.parent = bone_objs[bone_data["parent_id"]]
-
-        matrix = parse_matrix(bone_data["matrix"])
-        if bone.parent:
-            parent_matrix = bone_objs[bone_data["parent_id"]].matrix
-            matrix.translation += parent_matrix.translation
-
-        bone.head = (matrix[3][0], matrix[3][1], matrix[3][2])
-        bone.tail = (matrix[3][0], matrix[3][1], matrix[3][2] + 0.1)
-        bone.matrix = bpy.context.object.matrix_world @ matrix
-
-        bone_objs[bone_id] = bone
-
-    bpy.ops.object.mode_set(mode='OBJECT')
-
-    for obj_name, obj_data in objects.items():
-        for mesh_data in obj_data["meshes"]:
-            mesh = bpy.data.meshes.new(mesh_data["name"])
-            
-            valid_faces = []
-            for face in mesh_data["faces"]:
-                if all(index < len(mesh_data["vertices"]) for index in face):
-                    valid_faces.append(face)
-                else:
-                    print(f"Invalid face indices: {face}")
-
-            mesh.from_pydata(mesh_data["vertices"], [], valid_faces)
-            mesh.update()
-
-            obj = bpy.data.objects.new(obj_name, mesh)
-            obj.parent = armature_obj
-
-            linked_node_vertex_groups = {}
-            for index, linked_node_id in enumerate(obj_data["linked_nodes"]):
-                if linked_node_id in bones:
-                    vg = obj.vertex_groups.new(name=bones[linked_node_id]["name"])
-                    linked_node_vertex_groups[index] = vg
-
-            scene = bpy.context.scene
-            scene.collection.objects.link(obj)
-
-            bpy.context.view_layer.objects.active = obj
+    if not bone_nodes:
+        return armature_obj
+
+    # Only parents that come before their children in the file are linked
+    parents = []
+    indices = {}
+    for i, node in enumerate(bone_nodes):
+        parents.append(indices.get(node.parent_id, -1))
+        indices[node.node_id] = i
+    rest = geometry.bone_rest_matrices([node.matrix for node in bone_nodes], parents)
+
+    # mode_set works on the view layer's active object and takes every
+    # selected armature into edit mode with it
+    view_layer = bpy.context.view_layer
+    previous_active = view_layer.objects.active
+    previous_selected = list(view_layer.objects.selected)
+    if previous_active is not None and previous_active.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    for obj in previous_selected:
+        obj.select_set(False)
+    view_layer.objects.active = armature_obj
+    armature_obj.select_set(True)
+    try:
+        bpy.ops.object.mode_set(mode='EDIT')
+        edit_bones = [armature.edit_bones.new(node.name) for node in bone_nodes]
+        for bone, parent in zip(edit_bones, parents):
+            if parent >= 0:
+                bone.parent = edit_bones[parent]
+
+        # Setting the matrix keeps the bone length, so the tails go in first
+        tails = np.tile(np.array([0.0, 0.0, 0.1], dtype=np.float32), len(bone_nodes))
+        armature.edit_bones.foreach_set("tail", tails)
+        # Matrix properties take their values column by column
+        armature.edit_bones.foreach_set("matrix", rest.transpose(0, 2, 1).astype(np.float32).ravel())
+    finally:
+        if armature_obj.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        armature_obj.select_set(False)
+        for obj in previous_selected:
             obj.select_set(True)
+        view_layer.objects.active = previous_active
+    return armature_obj
+
+def build_mesh_object(node, prepared, bones, armature_obj, meshes, file_telemetry):
+    """Create the object of a node from its geometry.PreparedMesh, returning whether its mesh datablock is new.
+
+    meshes maps geometry hashes to the shared meshes, it is None when meshes
+    are not shared.
+    """
+    with file_telemetry.stage('build') as record:
+        if len(prepared.invalid):
+            logger.warning("Skipped %d triangles with invalid vertex indices in %s", len(prepared.invalid), node.mesh.name)
+            if logger.isEnabledFor(logging.DEBUG):
+                for face in prepared.invalid:
+                    logger.debug("Invalid face indices: %s", tuple(face))
+
+        mesh = meshes.get(prepared.key) if meshes is not None else None
+        if mesh is not None and not is_unchanged(mesh, prepared):
+            # Edited after its import, it keeps its geometry but is not shared any more
+            logger.debug("Mesh %s was edited, building %s again", mesh.name, node.mesh.name)
+            del mesh[MESH_KEY_PROPERTY]
+            mesh = None
+        is_new = mesh is None
+        if is_new:
+            mesh = build_mesh(node.mesh.name, prepared.vertices, prepared.triangles, prepared.uvs, prepared.normals)
+            assign_materials(mesh, prepared.slot_names, prepared.material_indices)
+            if meshes is not None:
+                mesh[MESH_KEY_PROPERTY] = prepared.key
+                meshes[prepared.key] = mesh
+            record['count'] += len(prepared.vertices)
+
+        obj = bpy.data.objects.new(node.name, mesh)
+        obj.parent = armature_obj
+
+        linked_node_vertex_groups = {}
+        for index, linked_node_id in prepared.group_links:
+            linked_node_vertex_groups[index] = obj.vertex_groups.new(name=bones[linked_node_id].name)
+
+        scene = bpy.context.scene
+        scene.collection.objects.link(obj)
+
+        bpy.context.view_layer.objects.active = obj
+        obj.select_set(True)
+
+        mod = obj.modifiers.new(name='Armature', type='ARMATURE')
+        mod.object = armature_obj
+
+    if is_new:
+        # Weights live in the mesh, a shared mesh already has them
+        with file_telemetry.stage('weights') as record:
+            weight_count = assign_vertex_weights(linked_node_vertex_groups, prepared.weight_buckets)
+            logger.debug("Assigned %d vertex weights to %d groups of %s", weight_count, len(linked_node_vertex_groups), node.name)
+            record['count'] += weight_count
+    return is_new
+
+def import_model(model, name, file_telemetry=None, share_meshes=True, nodes=None, threads=0):
+    """Build the armature and mesh objects of a decoded model.
+
+    With share_meshes, a mesh identical to one imported before reuses its
+    datablock, only the object is new. The 'armature', 'build' and 'weights'
+    stages are recorded in file_telemetry when given. nodes are the decoded
+    nodes to build the meshes of, model.nodes by default; pass a
+    parse_pool.stream_nodes generator to decode every mesh just before it is
+    built, model then only needs the headers. The vertex data of the next
+    meshes is converted in threads (default: one per core) while each mesh
+    is built, the time spent waiting for it is the 'prepare' stage. Given
+    nodes are converted one at a time instead, reading ahead would keep
+    several streamed meshes in memory.
+    """
+    for _ in import_model_steps(model, name, file_telemetry, share_meshes, nodes, threads):
+        pass
+
+def import_model_steps(model, name, file_telemetry=None, share_meshes=True, nodes=None, threads=0):
+    """Generator version of import_model, yielding after the armature and after every mesh.
+
+    The scene is in object mode at every yield, so the import can be spread
+    over several event loop iterations or stopped between steps.
+    """
+    if file_telemetry is None:
+        file_telemetry = telemetry.FileTelemetry(name)
+    if nodes is None:
+        nodes = model.nodes
+    else:
+        # A stream keeps to one mesh in memory
+        threads = 1
 
-            mesh.uv_layers.new(name='UVMap')
-            uv_layer = mesh.uv_layers.active.data
-            for poly in mesh.polygons:
-                for loop_index in range(poly.loop_start, poly.loop_start + poly.loop_total):
-                    loop_vert_index = mesh.loops[loop_index].vertex_index
-                    uv_layer[loop_index].uv = mesh_data["uvs"][loop_vert_index]
-
-            mesh.normals_split_custom_set_from_vertices(mesh_data["normals"])
-
-            for i, (weights, links) in enumerate(zip(mesh_data["weights"], mesh_data["links"])):
-                for weight, link in zip(weights, links):
-                    if weight > 0:
-                        if link < len(current_object["linked_nodes"]):
-                            node_id = current_object["linked_nodes"][link]
-                            if node_id in linked_node_vertex_groups:
-                                print(f"Assigning weight {weight / 255.0} to vertex {i} for node {bones[node_id]['name']}")
-                                linked_node_vertex_groups[link].add([i], weight / 255.0, 'REPLACE')
-
-            mod = obj.modifiers.new(name='Armature', type='ARMATURE')
-            mod.object = armature_obj
-
-            if mesh_data["name"] in obj_data["materials"]:
-                for submesh in obj_data["submeshes"]:
-                    if mesh_data["name"] in obj_data["materials"]:
-                        if submesh["material_index"] <= len(obj_data["materials"][mesh_data["name"]]):
-                            mat_name = obj_data["materials"][mesh_data["name"]][submesh["material_index"]]
-                            mat = bpy.data.materials.get(mat_name)
-                            if not mat:
-                                mat = bpy.data.materials.new(name=mat_name)
-                            if not obj.data.materials:
-                                obj.data.materials.append(mat)
-                            else:
-                                obj.data.materials.append(mat)
-
-                            for poly in mesh.polygons:
-                                if submesh["triangle_start"] <= poly.index <= submesh["triangle_end"]:
-                                    poly.material_index = len(obj.data.materials) - 1
+    bones = {}
+    for node in model.nodes:
+        if node.name:
+            bones[node.node_id] = node
+
+    with file_telemetry.stage('armature') as record:
+        armature_obj = build_armature(list(bones.values()))
+        armature = armature_obj.data
+        bpy.context.view_layer.objects.active = armature_obj
+        record['count'] += len(bones)
+    yield
+
+    meshes = shared_meshes() if share_meshes else None
+    mesh_count = 0
+    shared_count = 0
+    # Meshes left out of a selective import only have their header and are skipped
+    prepared_meshes = geometry.prepare_meshes(nodes, set(bones), share_meshes, threads)
+    with contextlib.closing(prepared_meshes):
+        while True:
+            with file_telemetry.stage('prepare', memory=False):
+                item = next(prepared_meshes, None)
+            if item is None:
+                break
+            node, prepared = item
+
+            is_new = build_mesh_object(node, prepared, bones, armature_obj, meshes, file_telemetry)
+            mesh_count += 1
+            if not is_new:
+                shared_count += 1
+            # A streamed mesh is released once built
+            item = node = prepared = None
+            yield
 
     bpy.context.view_layer.update()
     armature_obj.rotation_euler = (math.radians(90), 0, 0)
     armature_obj.scale = (1, 1, -1)
-    armature.name = bpy.path.display_name_from_filepath(txt_file_path)
+    armature.name = name
     bpy.context.view_layer.update()
 
-    print("Model imported successfully.")
\ No newline at end of file
+    logger.info("Imported %s: %d bones, %d meshes (%d shared)", name, len(bones), mesh_count, shared_count)
@@ -1,5 +1,179 @@
+import fnmatch
+import functools
+import logging
+import mmap
+import os
+import re
 import struct
-import bpy
+from dataclasses import dataclass, field
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the decoded output changes, cached models of older versions are ignored
+PARSER_VERSION = 1
+
+@dataclass
+class Mesh:
+    name: str
+    vertex_count: int
+    triangle_count: int
+    materials: list = field(default_factory=list)
+    # (L, 4, 4) float32
+    link_matrices: np.ndarray = field(default_factory=lambda: np.zeros((0, 4, 4), dtype=np.float32))
+    # (L,) int16 node ids of the link matrices
+    linked_nodes: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int16))
+    # (S, 5) int32 rows of material index, triangle offset, triangle count,
+    # vertex offset, vertex count
+    submeshes: np.ndarray = field(default_factory=lambda: np.zeros((0, 5), dtype=np.int32))
+    # Per submesh int32 index lists, only present on skinned meshes
+    submesh_indices: list = field(default_factory=list)
+    data_blocks: list = field(default_factory=list)
+    # Per-attribute NumPy vertex columns keyed by item type name ('position', 'uv', ...)
+    vertices: dict = field(default_factory=dict)
+    # (N, 3) uint16
+    triangles: np.ndarray = field(default_factory=lambda: np.zeros((0, 3), dtype=np.uint16))
+    # (lower, upper) corners of the mesh's bounding box
+    bounds: tuple = ()
+    # (start, end) byte offsets of the mesh in the file
+    extent: tuple = ()
+    # False when the vertex and triangle data were skipped instead of read
+    decoded: bool = True
+
+@dataclass
+class Node:
+    parent_id: int
+    node_id: int
+    link_in_count: int
+    name: str
+    # (4, 4) float32
+    matrix: np.ndarray
+    mesh: Mesh = None
+    # (start, end) byte offsets of the node, including its mesh
+    extent: tuple = ()
+
+def same_file_path(path, other_path):
+    return os.path.normcase(os.path.abspath(path)) == os.path.normcase(os.path.abspath(other_path))
+
+# A LOD marker in a node or mesh name, e.g. body_lod1, BodyLod2 or LOD_0
+LOD_PATTERN = re.compile(r'lod[ _-]?(\d+)', re.IGNORECASE)
+
+def lod_name(name):
+    """Split a node or mesh name into (LOD level, name without the marker), the level is None without a marker."""
+    match = LOD_PATTERN.search(name)
+    if match is None:
+        return None, name
+    return int(match.group(1)), (name[:match.start()] + name[match.end():]).strip(' _-.')
+
+def classify_lods(nodes):
+    """Return {node index: (part, LOD level)} for the nodes with a mesh.
+
+    The level comes from the node name, then the mesh name, then the nearest
+    ancestor node with a marker; meshes without one anywhere are level 0.
+    The part is the marked name without its marker, in lower case, so the
+    LODs of one part share it. Under a marked ancestor the names of the
+    nodes below it are part of the part, so LOD0/wheel and LOD1/body differ.
+    """
+    nodes_by_id = {node.node_id: node for node in nodes}
+    lods = {}
+    for i, node in enumerate(nodes):
+        if node.mesh is None:
+            continue
+        level, part = lod_name(node.name)
+        if level is None:
+            level, part = lod_name(node.mesh.name)
+        path = [node.name]
+        ancestor = nodes_by_id.get(node.parent_id)
+        visited = {node.node_id}
+        while level is None and ancestor is not None and ancestor.node_id not in visited:
+            visited.add(ancestor.node_id)
+            level, part = lod_name(ancestor.name)
+            if level is None:
+                path.append(ancestor.name)
+            else:
+                part = '/'.join([part] + path[::-1])
+            ancestor = nodes_by_id.get(ancestor.parent_id)
+        if level is None:
+            level, part = 0, node.name
+        lods[i] = (part.lower(), level)
+    return lods
+
+def choose_lods(nodes, lod):
+    """Return the indices of the mesh nodes that make up one LOD of the model.
+
+    lod is 'highest' for the most detailed level of every part, 'lowest' for
+    the least detailed one, or a level number. A part without that level uses
+    its closest more detailed one, or its most detailed if it has none.
+    """
+    lods = classify_lods(nodes)
+    part_levels = {}
+    for part, level in lods.values():
+        part_levels.setdefault(part, set()).add(level)
+
+    chosen = {}
+    for part, levels in part_levels.items():
+        if lod == 'highest':
+            chosen[part] = min(levels)
+        elif lod == 'lowest':
+            chosen[part] = max(levels)
+        else:
+            chosen[part] = max((level for level in levels if level <= lod), default=min(levels))
+    return {i for i, (part, level) in lods.items() if chosen[part] == level}
+
+@dataclass
+class NodeSelection:
+    """Picks the nodes whose meshes are decoded, the other meshes are skipped.
+
+    Called with (node index, node name, mesh name), where the index is the
+    node's position in the file. A node is picked when its index is in
+    indices (if given) and its node or mesh name matches one of the
+    case-insensitive fnmatch patterns (if any). indices only apply to
+    file_path when that is set, other files ignore them. With lod set
+    ('highest', 'lowest' or a level, see choose_lods) only one LOD of every
+    part is picked; that depends on the whole file, so a selection has to be
+    resolved for each file first.
+    """
+    indices: frozenset = None
+    patterns: tuple = ()
+    lod: object = None
+    file_path: str = None
+
+    def __call__(self, index, node_name, mesh_name):
+        if self.indices is not None and index not in self.indices:
+            return False
+        if self.patterns:
+            candidates = (node_name.lower(), mesh_name.lower())
+            return any(fnmatch.fnmatchcase(name, pattern.lower()) for name in candidates for pattern in self.patterns)
+        return True
+
+    def resolve(self, file_path, model=None):
+        """Return the selection for file_path, with the LOD choice turned into node indices.
+
+        model holds the file's nodes, their headers are read from the file
+        when it is not given.
+        """
+        indices = self.indices
+        if self.file_path is not None and not same_file_path(self.file_path, file_path):
+            indices = None
+        if self.lod is not None:
+            if model is None:
+                # Only the headers are needed, the mesh bodies are skipped
+                model = scan_data(file_path, quiet=True)
+            lod_indices = choose_lods(model.nodes, self.lod)
+            indices = lod_indices if indices is None else indices & lod_indices
+        if indices is None and not self.patterns:
+            return None
+        return NodeSelection(None if indices is None else frozenset(indices), self.patterns)
+
+@dataclass
+class Model:
+    xml: str = ''
+    bounds: tuple = ()
+    nodes: list = field(default_factory=list)
+    # Attribute dicts of the <Material .../> entries in the XML header
+    materials: list = field(default_factory=list)
+    # Set when decoding stopped early, nodes holds what was decoded before that
+    error: str = ''
 
 def read_from_buffer(fmt, data, offset):
     size = struct.calcsize(fmt)
@@ -7,295 +181,241 @@ def read_from_buffer(fmt, data, offset):
         raise ValueError(f"Attempting to read {size} bytes from offset {offset}, which exceeds buffer size {len(data)}")
     return struct.unpack_from(fmt, data, offset), offset + size
 
-def print_and_log(log_file, message):
-    print(message)
-    log_file.write(message + "\n")
-
-def print_vector3(data, offset, log_file):
+def read_array(data, offset, dtype, shape):
+    dtype = np.dtype(dtype)
+    count = int(np.prod(shape))
+    if count < 0:
+        raise ValueError(f"Invalid element count {count} at offset {offset}")
+    size = dtype.itemsize * count
+    if offset + size > len(data):
+        raise ValueError(f"Attempting to read {size} bytes from offset {offset}, which exceeds buffer size {len(data)}")
+    return np.frombuffer(data, dtype=dtype, count=count, offset=offset).reshape(shape), offset + size
+
+def read_text(data, offset, length):
+    # Decoded straight from the buffer, without copying the bytes out first
+    return str(data[offset:offset + length], 'utf-8', 'replace'), offset + length
+
+def read_string(data, offset):
+    (length,), offset = read_from_buffer('i', data, offset)
+    if length > 0 and length <= len(data) - offset:
+        value, offset = read_text(data, offset, length)
+        # Strings are stored with a trailing NUL
+        return value[:-1], offset
+    return '', offset
+
+def parse_materials(xml):
+    materials = []
+    for material_data in re.findall(r'<Material(.*?)\/>', xml, re.DOTALL):
+        materials.append(dict(re.findall(r'(\w+)="([^"]+)"', material_data)))
+    return materials
+
+def read_vector3(data, offset, log):
     (x, y, z), offset = read_from_buffer('fff', data, offset)
-    message = f"vector3: ({x:+6.2f}; {y:+6.2f}; {z:+6.2f})"
-    print_and_log(log_file, message)
-    return offset
+    if log:
+        log(f"vector3: ({x:+6.2f}; {y:+6.2f}; {z:+6.2f})")
+    return (x, y, z), offset
 
-def print_vector4(data, offset, blender, invert, log_file):
-    (x, y, z, w), offset = read_from_buffer('ffff', data, offset)
-    if blender:
-        if invert:
-            x, y, z = -x, -y, -z
-        message = f"vector4 (blender, invert): ({x:+6.2f}; {y:+6.2f}; {z:+6.2f}; {w:+6.2f})"
-    else:
-        message = f"vector4: ({x:+6.2f}; {y:+6.2f}; {z:+6.2f}; {w:+6.2f})"
-    print_and_log(log_file, message)
-    return offset
+def read_matrix(data, offset, log):
+    matrix, offset = read_array(data, offset, '<f4', (4, 4))
+    if log:
+        for x, y, z, w in matrix:
+            log(f"vector4: ({x:+6.2f}; {y:+6.2f}; {z:+6.2f}; {w:+6.2f})")
+    return matrix, offset
 
-def print_triangle(data, offset, log_file):
-    (a, b, c), offset = read_from_buffer('HHH', data, offset)
-    message = f"triangle: (a={a}, b={b}, c={c})"
-    print_and_log(log_file, message)
-    return offset
+def read_node(data, offset, log):
+    (parent_id, node_id, link_in_count, space1), offset = read_from_buffer('hhhh', data, offset)
+    name, offset = read_string(data, offset)
+    if log:
+        log(f"Node: parent_id={parent_id}, node_id={node_id}, link_in_count={link_in_count}, SPACE1={space1}, name={name}")
 
-def print_node(data, offset, log_file):
-    try:
-        (parent_id, node_id, link_in_count, space1), offset = read_from_buffer('hhhh', data, offset)
-        (name_length,), offset = read_from_buffer('i', data, offset)
-        if name_length > 0 and name_length <= len(data) - offset:
-            (name,), offset = read_from_buffer(f'{name_length}s', data, offset)
-            name = name.decode(errors='replace')
-        else:
-            name = ''
-        message = f"Node: parent_id={parent_id}, node_id={node_id}, link_in_count={link_in_count}, SPACE1={space1}, name={name[:-1]}"
-        print_and_log(log_file, message)
-        
-        # Reading matrix data
-        for _ in range(4):
-            offset = print_vector4(data, offset, blender=False, invert=False, log_file=log_file)
-        
-        return offset, link_in_count
-    except (ValueError, struct.error) as e:
-        print_and_log(log_file, f"Error reading node at offset {offset}: {e}")
-        return offset, link_in_count
+    # Reading matrix data
+    matrix, offset = read_matrix(data, offset, log)
+
+    return Node(parent_id, node_id, link_in_count, name, matrix), offset
 
 def check_next_block(data, offset):
     (next_block,), offset = read_from_buffer('i', data, offset)
     return next_block, offset
 
-def print_mesh(data, offset, log_file, link_in_count):
-    try:
-        # Go 4 bytes back before reading the vertex count
-        offset -= 4
-        (vertex_count,), offset = read_from_buffer('i', data, offset)
-        (triangle_count,), offset = read_from_buffer('i', data, offset)
-        (name_length,), offset = read_from_buffer('i', data, offset)
-        if name_length > 0 and name_length <= len(data) - offset:
-            (name,), offset = read_from_buffer(f'{name_length}s', data, offset)
-            name = name.decode(errors='replace')
-        else:
-            name = ''
-        message = f"Mesh: vertex_count={vertex_count}, triangle_count={triangle_count}, name={name[:-1]}"
-        print_and_log(log_file, message)
-        
-        # Read additional properties
-        (unknown1,), offset = read_from_buffer('i', data, offset)
-        (material_count,), offset = read_from_buffer('i', data, offset)
-        (unknown2,), offset = read_from_buffer('i', data, offset)
-        message = f"UNKNOWN1={unknown1}, material_count={material_count}, UNKNOWN2={unknown2}"
-        print_and_log(log_file, message)
-        
-        # Initialize a list to store material names
-        materials = []
-
-        # Read materials
-        for _ in range(material_count):
-            (material_length,), offset = read_from_buffer('i', data, offset)
-            if material_length > 0 and material_length <= len(data) - offset:
-                (material_name,), offset = read_from_buffer(f'{material_length}s', data, offset)
-                material_name = material_name.decode(errors='replace')
-                materials.append(material_name)
-                # Exclude the last character from material_name before printing
-                message = f"Material: {material_name[:-1]}"
-                print_and_log(log_file, message)
-        
-        # Reading link matrices
-        (link_out_count,), offset = read_from_buffer('i', data, offset)
-        print_and_log(log_file, f"Link out count: {link_out_count}")
-        for _ in range(link_out_count):
-            for _ in range(4):
-                offset = print_vector4(data, offset, blender=False, invert=False, log_file=log_file)
-        
-        # Reading additional mesh properties
-        (index_of_type,), offset = read_from_buffer('h', data, offset)
-        message = f"Index of Type: {index_of_type}"
-        print_and_log(log_file, message)
-
-        if link_out_count == 0:
-            for _ in range(2):
-                offset = print_vector3(data, offset, log_file)
-            # Handle mesh when link_out_count is 0
-            (submesh_count,), offset = read_from_buffer('i', data, offset)
-            print_and_log(log_file, f"Submesh Count: {submesh_count}")
-
-            # Read submesh data
-            submeshes = []
-            # Reading submesh data and corresponding indices
-            for i in range(submesh_count):
-                submesh_data, offset = read_from_buffer('iiiii', data, offset)
-                
-                # Define the variables for clarity
-                material_index = submesh_data[0]
-                submesh_triangle_offset = submesh_data[1]
-                submesh_triangle_count = submesh_data[2] + submesh_data[1] - 1
-                submesh_vertex_offset = submesh_data[3]
-                submesh_vertex_count = submesh_data[4] + submesh_data[3]  - 1
-
-                # Determine the material name
-                material_name = materials[material_index] if 0 <= material_index < len(materials) else "No Material"
-                message = (f"Submesh {i} Data: Material Index: {material_index} ({material_name[:-1]}), "
-                           f"From triangle {submesh_triangle_offset} to triangle {submesh_triangle_count}, "
-                           f"From vertex {submesh_vertex_offset} to vertex {submesh_vertex_count}")
-
-                print_and_log(log_file, message)
-
-
-            # Reading count and int16 blocks for each vertex
-            (count,), offset = read_from_buffer('i', data, offset)
-            print_and_log(log_file, f"Count={count}")
-
-            data_blocks = []
-            for _ in range(count):
-                int16_block, offset = read_from_buffer('hhhh', data, offset)
-                data_blocks.append(int16_block)
-                print_and_log(log_file, f"Int16 Block={int16_block}")
-
-            (flag1, flag2), offset = read_from_buffer('ii', data, offset)
-            print_and_log(log_file, f"Flag1={flag1}, Flag2={flag2}")
-
-            # Reading vertices
-            print_and_log(log_file, "Vertices:")
-            for _ in range(vertex_count):
-                offset, message = read_vertex_data(data, offset, log_file, data_blocks)
-                print_and_log(log_file, message)
-
-            # Reading triangles
-            print_and_log(log_file, "Triangles:")
-            for _ in range(triangle_count):
-                offset = print_triangle(data, offset, log_file)
-
-            if link_in_count != 0:
-                (extra_data_index,), offset = read_from_buffer('h', data, offset)
-                print_and_log(log_file, f"Extra Data Index: {extra_data_index}")
-            
-            # Read int16 flag at the end of the triangles block
-            (end_flag,), offset = read_from_buffer('h', data, offset)
-            message = f"End Flag: {end_flag}"
-            print_and_log(log_file, message)
-
-            # Reading the four xyzw vectors
-
-            # Additional handling based on end_flag
-            if end_flag > 100:
-                for _ in range(4):
-                    offset = print_vector4(data, offset, blender=False, invert=False, log_file=log_file)
-            elif 4 <= end_flag <= 17:
-                offset += 1  # Go forward 1 byte
-                (count,), offset = read_from_buffer('h', data, offset)
-                offset += 1  # Skip 1 byte
-                offset += count + 16  # Skip the specified bytes plus 16
-                
-                # Read the int16 flag after the skip
-                (next_flag,), offset = read_from_buffer('h', data, offset)
-                if next_flag > 100:
-                    # Handle case for next_flag > 100
-                    for _ in range(4):
-                        offset = print_vector4(data, offset, blender=False, invert=False, log_file=log_file)
+def log_submeshes(log, submeshes, materials):
+    for i, (material_index, triangle_offset, triangle_count, vertex_offset, vertex_count) in enumerate(submeshes):
+        # Determine the material name
+        material_name = materials[material_index] if 0 <= material_index < len(materials) else "No Material"
+        message = (f"Submesh {i} Data: Material Index: {material_index} ({material_name}), "
+                   f"From triangle {triangle_offset} to triangle {triangle_offset + triangle_count - 1}, "
+                   f"From vertex {vertex_offset} to vertex {vertex_offset + vertex_count - 1}")
+        log(message)
+
+def read_geometry(data, offset, log, mesh, decode=True):
+    # Reading count and int16 blocks for each vertex
+    (count,), offset = read_from_buffer('i', data, offset)
+    if log:
+        log(f"Count={count}")
+
+    for _ in range(count):
+        int16_block, offset = read_from_buffer('hhhh', data, offset)
+        mesh.data_blocks.append(int16_block)
+        if log:
+            log(f"Int16 Block={int16_block}")
+
+    (flag1, flag2), offset = read_from_buffer('ii', data, offset)
+    if log:
+        log(f"Flag1={flag1}, Flag2={flag2}")
+
+    if not decode:
+        # The layout gives the vertex stride, so both blocks are stepped over
+        # without touching their bytes
+        stride = compile_vertex_layout(tuple(mesh.data_blocks)).itemsize
+        size = stride * mesh.vertex_count + 6 * mesh.triangle_count
+        if mesh.vertex_count < 0 or mesh.triangle_count < 0 or offset + size > len(data):
+            raise ValueError(f"Attempting to skip {size} bytes from offset {offset}, which exceeds buffer size {len(data)}")
+        mesh.decoded = False
+        if log:
+            log(f"Skipped {mesh.vertex_count} vertices and {mesh.triangle_count} triangles")
+        return offset + size
+
+    # Reading vertices
+    mesh.vertices, offset = read_vertex_data(data, offset, mesh.data_blocks, mesh.vertex_count)
+    if log:
+        log(f"Vertices: {mesh.vertex_count} ({', '.join(mesh.vertices)})")
+
+    # Reading triangles
+    mesh.triangles, offset = read_array(data, offset, '<u2', (mesh.triangle_count, 3))
+    if log:
+        log(f"Triangles: {mesh.triangle_count}")
 
-        else:
-            (unknown3,), offset = read_from_buffer('h', data, offset)
-            (submesh_count,), offset = read_from_buffer('i', data, offset)
-            print_and_log(log_file, f"UNKNOWN3={unknown3}, Submesh Count={submesh_count}")
-            
-            submeshes = []
-            # Reading submesh indices
-            submesh_indices = []
-            for _ in range(submesh_count):
-                (submesh_index,), offset = read_from_buffer('i', data, offset)
-                submesh_indices.append(submesh_index)
-                print_and_log(log_file, f"Submesh Index: {submesh_index}")
-
-            # Reading submesh data and corresponding indices
-            for i in range(submesh_count):
-                submesh_data, offset = read_from_buffer('iiiii', data, offset)
-                
-                # Define the variables for clarity
-                material_index = submesh_data[0]
-                submesh_triangle_offset = submesh_data[1]
-                submesh_triangle_count = submesh_data[2] + submesh_data[1] - 1
-                submesh_vertex_offset = submesh_data[3]
-                submesh_vertex_count = submesh_data[4] + submesh_data[3] - 1
-
-                # Determine the material name
-                material_name = materials[material_index] if 0 <= material_index < len(materials) else "No Material"
-                message = (f"Submesh {i} Data: Material Index: {material_index} ({material_name[:-1]}), "
-                           f"From triangle {submesh_triangle_offset} to triangle {submesh_triangle_count}, "
-                           f"From vertex {submesh_vertex_offset} to vertex {submesh_vertex_count}")
-
-                print_and_log(log_file, message)
-
-                # Read indices for the current submesh
-                indices = []
-                for _ in range(submesh_indices[i]):
-                    (index,), offset = read_from_buffer('i', data, offset)
-                    indices.append(index)
-                print_and_log(log_file, f"Indices: {indices}")
-                
-            linked_nodes = []
-            for _ in range(link_out_count):
-                (linked_node,), offset = read_from_buffer('h', data, offset)
-                linked_nodes.append(linked_node)
-                print_and_log(log_file, f"Linked Node={linked_node}")
-                
-            for _ in range(2):
-                offset = print_vector3(data, offset, log_file)
-                
-            for i in range(2):
-                (block_index,), offset = read_from_buffer('i', data, offset)
-                print_and_log(log_file, f"Block Index {i + 1}: {block_index}")
-                            
-            (sub_triangle_offset, sub_triangle_count, sub_vertex_offset, sub_vertex_count), offset = read_from_buffer('iiii', data, offset)
-            print_and_log(log_file, f"Sub Triangle Offset={sub_triangle_offset}, Sub Triangle Count={sub_triangle_count}, Sub Vertex Offset={sub_vertex_offset}, Sub Vertex Count={sub_vertex_count}")
-            
-            # Reading count and int16 blocks for each vertex
-            (count,), offset = read_from_buffer('i', data, offset)
-            print_and_log(log_file, f"Count={count}")
-
-            data_blocks = []
-            for _ in range(count):
-                int16_block, offset = read_from_buffer('hhhh', data, offset)
-                data_blocks.append(int16_block)
-                print_and_log(log_file, f"Int16 Block={int16_block}")
-
-            (flag1, flag2), offset = read_from_buffer('ii', data, offset)
-            print_and_log(log_file, f"Flag1={flag1}, Flag2={flag2}")
-
-            # Reading vertices
-            print_and_log(log_file, "Vertices:")
-            for _ in range(vertex_count):
-                offset, message = read_vertex_data(data, offset, log_file, data_blocks)
-                print_and_log(log_file, message)
-
-            # Reading triangles
-            print_and_log(log_file, "Triangles:")
-            for _ in range(triangle_count):
-                offset = print_triangle(data, offset, log_file)
+    return offset
+
+def skip_end_block(data, offset, log):
+    # Read int16 flag at the end of the triangles block
+    (end_flag,), offset = read_from_buffer('h', data, offset)
+    if log:
+        log(f"End Flag: {end_flag}")
+
+    # Additional handling based on end_flag
+    if end_flag > 100:
+        _, offset = read_matrix(data, offset, log)
+    elif 4 <= end_flag <= 17:
+        offset += 1  # Go forward 1 byte
+        (count,), offset = read_from_buffer('h', data, offset)
+        offset += 1  # Skip 1 byte
+        offset += count + 16  # Skip the specified bytes plus 16
+
+        # Read the int16 flag after the skip
+        (next_flag,), offset = read_from_buffer('h', data, offset)
+        if next_flag > 100:
+            # Handle case for next_flag > 100
+            _, offset = read_matrix(data, offset, log)
+
+    return offset
 
+def read_mesh(data, offset, log, node, selection=None):
+    # Go 4 bytes back before reading the vertex count
+    offset -= 4
+    start = offset
+    (vertex_count,), offset = read_from_buffer('i', data, offset)
+    (triangle_count,), offset = read_from_buffer('i', data, offset)
+    name, offset = read_string(data, offset)
+    if log:
+        log(f"Mesh: vertex_count={vertex_count}, triangle_count={triangle_count}, name={name}")
+    mesh = Mesh(name, vertex_count, triangle_count)
+    decode = selection is None or selection(node.name, name)
+
+    # Read additional properties
+    (unknown1,), offset = read_from_buffer('i', data, offset)
+    (material_count,), offset = read_from_buffer('i', data, offset)
+    (unknown2,), offset = read_from_buffer('i', data, offset)
+    if log:
+        log(f"UNKNOWN1={unknown1}, material_count={material_count}, UNKNOWN2={unknown2}")
+
+    # Read materials
+    for _ in range(material_count):
+        material_name, offset = read_string(data, offset)
+        mesh.materials.append(material_name)
+        if log:
+            log(f"Material: {material_name}")
+
+    # Reading link matrices
+    (link_out_count,), offset = read_from_buffer('i', data, offset)
+    if log:
+        log(f"Link out count: {link_out_count}")
+    mesh.link_matrices, offset = read_array(data, offset, '<f4', (link_out_count, 4, 4))
+
+    # Reading additional mesh properties
+    (index_of_type,), offset = read_from_buffer('h', data, offset)
+    if log:
+        log(f"Index of Type: {index_of_type}")
+
+    if link_out_count == 0:
+        lower, offset = read_vector3(data, offset, log)
+        upper, offset = read_vector3(data, offset, log)
+        mesh.bounds = (lower, upper)
+        # Handle mesh when link_out_count is 0
+        (submesh_count,), offset = read_from_buffer('i', data, offset)
+        if log:
+            log(f"Submesh Count: {submesh_count}")
+
+        # Read submesh data
+        mesh.submeshes, offset = read_array(data, offset, '<i4', (submesh_count, 5))
+        if log:
+            log_submeshes(log, mesh.submeshes, mesh.materials)
+
+        offset = read_geometry(data, offset, log, mesh, decode)
+
+        if node.link_in_count != 0:
             (extra_data_index,), offset = read_from_buffer('h', data, offset)
-            print_and_log(log_file, f"Extra Data Index: {extra_data_index}")
-
-            # Read int16 flag at the end of the complex block
-            (end_flag,), offset = read_from_buffer('h', data, offset)
-            message = f"End Flag: {end_flag}"
-            print_and_log(log_file, message)
-
-            # Additional handling based on end_flag
-            if end_flag > 100:
-                for _ in range(4):
-                    offset = print_vector4(data, offset, blender=False, invert=False, log_file=log_file)
-            elif 4 <= end_flag <= 17:
-                offset += 1  # Go forward 1 byte
-                (count,), offset = read_from_buffer('h', data, offset)
-                offset += 1  # Skip 1 byte
-                offset += count + 16  # Skip the specified bytes plus 16
-                
-                # Read the int16 flag after the skip
-                (next_flag,), offset = read_from_buffer('h', data, offset)
-                if next_flag > 100:
-                    # Handle case for next_flag > 100
-                    for _ in range(4):
-                        offset = print_vector4(data, offset, blender=False, invert=False, log_file=log_file)
-
-        return offset
-    except (ValueError, struct.error) as e:
-        print_and_log(log_file, f"Error reading mesh at offset {offset}: {e}")
-        return offset
+            if log:
+                log(f"Extra Data Index: {extra_data_index}")
+
+    else:
+        (unknown3,), offset = read_from_buffer('h', data, offset)
+        (submesh_count,), offset = read_from_buffer('i', data, offset)
+        if log:
+            log(f"UNKNOWN3={unknown3}, Submesh Count={submesh_count}")
+
+        # Reading the index count of each submesh
+        index_counts, offset = read_array(data, offset, '<i4', (submesh_count,))
+        if (index_counts < 0).any():
+            raise ValueError(f"Invalid submesh index counts: {index_counts.tolist()}")
+        if log:
+            log(f"Submesh Index Counts: {index_counts.tolist()}")
+
+        # Every submesh is a 5 int descriptor followed by its indices, so the
+        # whole table is read as one int32 block and split by stride
+        strides = index_counts + 5
+        table, offset = read_array(data, offset, '<i4', (int(strides.sum()),))
+        starts = np.cumsum(strides) - strides
+        mesh.submeshes = table[starts[:, None] + np.arange(5)]
+        mesh.submesh_indices = [table[start + 5:start + stride] for start, stride in zip(starts, strides)]
+        if log:
+            log_submeshes(log, mesh.submeshes, mesh.materials)
+
+        mesh.linked_nodes, offset = read_array(data, offset, '<i2', (link_out_count,))
+        if log:
+            log(f"Linked Nodes={mesh.linked_nodes.tolist()}")
+
+        lower, offset = read_vector3(data, offset, log)
+        upper, offset = read_vector3(data, offset, log)
+        mesh.bounds = (lower, upper)
+
+        for i in range(2):
+            (block_index,), offset = read_from_buffer('i', data, offset)
+            if log:
+                log(f"Block Index {i + 1}: {block_index}")
+
+        (sub_triangle_offset, sub_triangle_count, sub_vertex_offset, sub_vertex_count), offset = read_from_buffer('iiii', data, offset)
+        if log:
+            log(f"Sub Triangle Offset={sub_triangle_offset}, Sub Triangle Count={sub_triangle_count}, Sub Vertex Offset={sub_vertex_offset}, Sub Vertex Count={sub_vertex_count}")
+
+        offset = read_geometry(data, offset, log, mesh, decode)
+
+        (extra_data_index,), offset = read_from_buffer('h', data, offset)
+        if log:
+            log(f"Extra Data Index: {extra_data_index}")
+
+    offset = skip_end_block(data, offset, log)
+    mesh.extent = (start, offset)
+    return mesh, offset
 
 # Define the data type and item type enums
 dataType = {
@@ -316,276 +436,213 @@ itemType = {
     0x0605: 'unknown605'
 }
 
-def read_vertex_data(data, offset, log_file, data_blocks):
+# Per-vertex storage of each (data type, item type) pair. Item types without
+# an entry under the 'unknown' data type occupy no bytes in the vertex.
+vectorFormats = {
+    'vector3': ('<f4', 3),
+    'vector2': ('<f4', 2),
+    'xyzw': ('u1', 4)
+}
+
+unknownFormats = {
+    'weight': ('i1', 4),
+    'normal': ('i1', 4),
+    'unknown605': ('<f8', 1),
+    'link': ('u1', 4)
+}
+
+@functools.lru_cache(maxsize=None)
+def compile_vertex_layout(data_blocks):
+    """Build the NumPy structured dtype for a tuple of vertex layout blocks.
+
+    Attributes are packed back to back in block order. When an item type
+    appears more than once only the last block keeps its name, the others are
+    left as padding.
+    """
+    fields = {}
+    stride = 0
+    for block in data_blocks:
+        unknown1, offset_value, dtype, itype = block
+        dtype_name = dataType.get(dtype, 'unknown')
+        itype_name = itemType.get(itype, 'unknown')
+
+        if dtype_name == 'unknown':
+            item_format = unknownFormats.get(itype_name)
+        else:
+            item_format = vectorFormats[dtype_name]
+        if item_format is None:
+            continue
+
+        base, count = item_format
+        field_dtype = np.dtype(base) if count == 1 else np.dtype((base, count))
+        fields[itype_name] = (field_dtype, stride)
+        stride += field_dtype.itemsize
+
+    return np.dtype({
+        'names': list(fields),
+        'formats': [field_dtype for field_dtype, _ in fields.values()],
+        'offsets': [field_offset for _, field_offset in fields.values()],
+        'itemsize': stride
+    })
+
+def read_vertex_data(data, offset, data_blocks, vertex_count):
+    vertex_dtype = compile_vertex_layout(tuple(data_blocks))
+    vertices, offset = read_array(data, offset, vertex_dtype, (vertex_count,))
+    columns = {name: vertices[name] for name in vertex_dtype.names}
+    return columns, offset
+
+def map_file(file_path):
+    """Return a read-only memoryview of the memory-mapped file.
+
+    Arrays decoded from it are views into the mapping, which stays alive for
+    as long as any of them is referenced.
+    """
+    with open(file_path, "rb") as f:
+        try:
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except ValueError:
+            # Empty files cannot be mapped
+            return memoryview(b'')
+
+def iter_model(file_path, log_file_path=None, selection=None, quiet=False):
+    """Decode a [meshes] file one node at a time.
+
+    Yields the Model first, with the XML header, materials and bounds but no
+    nodes, then every Node as soon as it and its mesh are decoded. The nodes
+    are not added to the Model, so a consumer that drops them only keeps one
+    mesh in memory. If decoding fails, model.error is set and the iteration
+    ends early. log_file_path, selection and quiet work as in parse_data.
+    """
+    if isinstance(selection, NodeSelection):
+        selection = selection.resolve(file_path)
+    model = Model()
+    data = map_file(file_path)
+
+    log_file = open(log_file_path, "w") if log_file_path else None
+    log = None
+    if log_file is not None or (not quiet and logger.isEnabledFor(logging.DEBUG)):
+        # Readers only format their messages when log is set
+        def log(message):
+            logger.debug(message)
+            if log_file is not None:
+                log_file.write(message + "\n")
+
+    def fail(model, offset, e):
+        # Keep whatever was decoded before the error so the import can still proceed
+        model.error = f"Error parsing data at offset {offset}: {e}"
+        if not quiet:
+            logger.warning("%s: %s", os.path.basename(file_path), model.error)
+        if log_file is not None:
+            log_file.write(model.error + "\n")
+
+    offset = 0
+    node_count = 0
+
     try:
-        vertex_info = {}
-        for block in data_blocks:
-            unknown1, offset_value, dtype, itype = block
-            dtype_name = dataType.get(dtype, 'unknown')
-            itype_name = itemType.get(itype, 'unknown')
-
-            if dtype_name == 'vector3':
-                (x, y, z), offset = read_from_buffer('fff', data, offset)
-                vertex_info[itype_name] = (x, y, z)
-            elif dtype_name == 'vector2':
-                (u, v), offset = read_from_buffer('ff', data, offset)
-                vertex_info[itype_name] = (u, v)
-            elif dtype_name == 'xyzw':  # Read as xyzw vector
-                (x, y, z, w), offset = read_from_buffer('BBBB', data, offset)
-                vertex_info[itype_name] = (x, y, z, w)
-            elif dtype_name == 'unknown':
-                if itype_name == 'weight':
-                    (weight1,), offset = read_from_buffer('b', data, offset)
-                    (weight2,), offset = read_from_buffer('b', data, offset)
-                    (weight3,), offset = read_from_buffer('b', data, offset)
-                    (weight4,), offset = read_from_buffer('b', data, offset)
-                    vertex_info[itype_name] = (weight1, weight2, weight3, weight4)
-                elif itype_name == 'normal':
-                    (nx,), offset = read_from_buffer('b', data, offset)
-                    (ny,), offset = read_from_buffer('b', data, offset)
-                    (nz,), offset = read_from_buffer('b', data, offset)
-                    (nw,), offset = read_from_buffer('b', data, offset)
-                    vertex_info[itype_name] = (nx, ny, nz, nw)
-                elif itype_name == 'unknown605':
-                    (unknown605,), offset = read_from_buffer('d', data, offset)
-                    vertex_info[itype_name] = unknown605
-                elif itype_name == 'link':
-                     (x, y, z, w), offset = read_from_buffer('BBBB', data, offset)
-                     vertex_info[itype_name] = (x, y, z, w)
-
-        message = "vertex: " + ", ".join([f"{key}={value}" for key, value in vertex_info.items()])
-        return offset, message
-    except (ValueError, struct.error) as e:
-        return offset, f"Error reading vertex data at offset {offset}: {e}"
+        # Parsing XML Length
+        (xml_length,), offset = read_from_buffer('i', data, offset)
+        if xml_length <= 0 or xml_length >= len(data):
+            raise ValueError(f"Invalid XML length: {xml_length}")
+
+        # Parsing XML
+        if xml_length - 2 > len(data) - offset:
+            raise ValueError(f"Invalid XML length: {xml_length}")
+        model.xml, offset = read_text(data, offset, xml_length - 2)
+        model.materials = parse_materials(model.xml)
+        if log:
+            log(f"XML: {model.xml}")
+
+        # Parsing SPACE1, SPACE2, SPACE3
+        (space1, space2, space3), offset = read_from_buffer('hhh', data, offset)
+        if log:
+            log(f"SPACE1: {space1}, SPACE2: {space2}, SPACE3={space3}")
+
+        # Parsing Node Count
+        (node_count,), offset = read_from_buffer('i', data, offset)
+        if node_count < 0 or node_count > 10000:  # Arbitrary large limit to catch errors
+            raise ValueError(f"Invalid node count: {node_count}")
+        if log:
+            log(f"Node Count: {node_count}")
+
+        # Parsing Limits (vector3[2])
+        lower, offset = read_vector3(data, offset, log)
+        upper, offset = read_vector3(data, offset, log)
+        model.bounds = (lower, upper)
+
+        # Parsing Mesh Count
+        (mesh_count,), offset = read_from_buffer('i', data, offset)
+        if mesh_count < 0 or mesh_count > 10000:  # Arbitrary large limit to catch errors
+            raise ValueError(f"Invalid mesh count: {mesh_count}")
+        if log:
+            log(f"Mesh Count: {mesh_count}")
 
-def parse_data(file_path, log_file_path):
-    with open(file_path, "rb") as f, open(log_file_path, "w") as log_file:
-        data = f.read()
+    except (ValueError, struct.error) as e:
+        fail(model, offset, e)
+        node_count = 0
 
-        offset = 0
+    node = None
+    try:
+        yield model
+
+        # Parsing Nodes and Meshes
+        for i in range(node_count):
+            if log:
+                log(f"Parsing node {i+1}/{node_count} at offset {offset}")
+            start = offset
+            # Let go of the previous node before decoding the next, the consumer may be done with it
+            node = None
+            node, offset = read_node(data, offset, log)
+
+            # Check if the next 4-byte block is non-zero to determine if it is a mesh
+            next_block, new_offset = check_next_block(data, offset)
+            if next_block != 0:
+                if log:
+                    log(f"Parsing mesh at offset {new_offset - 4}")
+                # read_mesh passes the names, the node's index is bound here
+                mesh_selection = functools.partial(selection, i) if selection is not None else None
+                node.mesh, offset = read_mesh(data, new_offset, log, node, mesh_selection)
+            else:
+                # If the block is zero, skip it to correctly align for the next node
+                offset = new_offset
+            node.extent = (start, offset)
+            yield node
 
-        try:
-            # Parsing XML Length
-            (xml_length,), offset = read_from_buffer('i', data, offset)
-            if xml_length <= 0 or xml_length >= len(data):
-                raise ValueError(f"Invalid XML length: {xml_length}")
-
-            # Parsing XML
-            (xml,), offset = read_from_buffer(f'{xml_length - 2}s', data, offset)
-            xml = xml.decode(errors='replace')
-            print_and_log(log_file, f"XML: {xml}")
-
-            # Parsing SPACE1, SPACE2, SPACE3
-            (space1, space2, space3), offset = read_from_buffer('hhh', data, offset)
-            print_and_log(log_file, f"SPACE1: {space1}, SPACE2: {space2}, SPACE3={space3}")
-
-            # Parsing Node Count
-            (node_count,), offset = read_from_buffer('i', data, offset)
-            if node_count < 0 or node_count > 10000:  # Arbitrary large limit to catch errors
-                raise ValueError(f"Invalid node count: {node_count}")
-            print_and_log(log_file, f"Node Count: {node_count}")
-
-            # Parsing Limits (vector3[2])
-            offset = print_vector3(data, offset, log_file=log_file)
-            offset = print_vector3(data, offset, log_file=log_file)
-
-            # Parsing Mesh Count
-            (mesh_count,), offset = read_from_buffer('i', data, offset)
-            if mesh_count < 0 or mesh_count > 10000:  # Arbitrary large limit to catch errors
-                raise ValueError(f"Invalid mesh count: {mesh_count}")
-            print_and_log(log_file, f"Mesh Count: {mesh_count}")
-
-            # Parsing Nodes and Meshes
-            for i in range(node_count):
-                print_and_log(log_file, f"Parsing node {i+1}/{node_count} at offset {offset}")
-                offset, link_in_count = print_node(data, offset, log_file=log_file)
-                
-                # Check if the next 4-byte block is non-zero to determine if it is a mesh
-                next_block, new_offset = check_next_block(data, offset)
-                if next_block != 0:
-                    print_and_log(log_file, f"Parsing mesh at offset {new_offset - 4}")
-                    offset = print_mesh(data, new_offset, log_file=log_file, link_in_count=link_in_count)
-                else:
-                    # If the block is zero, skip it to correctly align for the next node
-                    offset = new_offset
-
-        except (ValueError, struct.error) as e:
-            print_and_log(log_file, f"Error parsing data: {e}")
-
-def normalize_normal(x, y, z):
-    return (x / 255.0 * 2 - 1, y / 255.0 * 2 - 1, z / 255.0 * 2 - 1)
-
-def extract_mesh_data(node):
-    vertices = []
-    faces = []
-    uvs = []
-    normals = []
-    weights = []
-
-    print("Extracting mesh data...")
-    for i, vertex_data in enumerate(node['mesh']['vertices']):
-        print(f"Processing vertex {i}: {vertex_data}")
-        items = vertex_data['items']
-        print(f"Items: {items}")
-        position = items[0]['vertex']
-        vertex = (position['x'], position['y'], position['z'])
-        vertices.append(vertex)
-        
-        if len(items) > 1 and 'uv' in items[1]:
-            uv = items[1]['uv']
-            uvs.append((uv['u'], 1 - uv['v']))  # Flip UVs on the Y-axis
-        else:
-            uvs.append((0, 0))  # Default UV if missing
-        
-        if len(items) > 2 and 'normal' in items[2]:
-            normal = items[2]['normal']
-            normalized_normal = normalize_normal(normal['x'], normal['y'], normal['z'])
-            normals.append(normalized_normal)
-        else:
-            normals.append((0, 0, 0))  # Default normal if missing
-        
-        if len(items) > 4 and 'weight' in items[4]:
-            weight_data = items[4]['weight']
-            link_indices = items[5]['linkIndex'] if len(items) > 5 and 'linkIndex' in items[5] else [0] * len(weight_data)
-            weights.append({link_indices[j]: weight_data[j]['value'] / 255.0 for j in range(len(weight_data))})
-        else:
-            weights.append({})
-    
-    print("Extracted vertices:", vertices)
-    print("Extracted UVs:", uvs)
-    print("Extracted normals:", normals)
-    print("Extracted weights:", weights)
-
-    for submesh in node['mesh']['submesh']:
-        triangle_offset = submesh['triangleOffset']
-        triangle_count = submesh['triangleCount']
-        vertex_offset = submesh.get('vertexOffset', 0)
-
-        triangles = node['mesh'].get('triangles', [])
-
-        for i in range(triangle_offset, triangle_offset + triangle_count):
-            try:
-                index0 = triangles[i]['a'] + vertex_offset
-                index1 = triangles[i]['b'] + vertex_offset
-                index2 = triangles[i]['c'] + vertex_offset
-
-                max_index = len(vertices) - 1
-                if index0 > max_index or index1 > max_index or index2 > max_index:
-                    print(f"Skipping invalid face with indices: {index0}, {index1}, {index2}")
-                    continue
-
-                face = [index0, index1, index2]
-                faces.append(face)
-
-            except Exception as e:
-                print(f"Error processing face {i}: {e}")
-                break
-
-    print("Extracted faces:", faces)
-    return vertices, faces, uvs, normals, weights
-
-def extract_bone_data(json_data):
-    bones = {}
-    bone_list = []
-
-    for node in json_data['nodes']:
-        if 'matrix' in node:
-            bone = {
-                'name': node['name']['name'],
-                'parent_id': node['parentId'],
-                'matrix': node['matrix']['matrix'],
-                'id': node['id']
-            }
-            bones[node['id']] = bone
-            bone_list.append(bone)
-
-    return bone_list, bones
-
-def create_armature(name, bone_list, bones):
-    armature_data = bpy.data.armatures.new(name)
-    armature_object = bpy.data.objects.new(name, armature_data)
-
-    bpy.context.collection.objects.link(armature_object)
-    bpy.context.view_layer.objects.active = armature_object
-    bpy.ops.object.mode_set(mode='EDIT')
-
-    for bone_data in bone_list:
-        bone = armature_data.edit_bones.new(bone_data['name'])
-        matrix = bone_data['matrix']
-        bone.head = (matrix['pos']['x'], matrix['pos']['y'], matrix['pos']['z'])
-        bone.tail = (matrix['pos']['x'] + 1, matrix['pos']['y'], matrix['pos']['z'])
-
-        if bone_data['parent_id'] >= 0 and bone_data['parent_id'] in bones:
-            parent_bone = armature_data.edit_bones[bones[bone_data['parent_id']]['name']]
-            bone.parent = parent_bone
-
-    bpy.ops.object.mode_set(mode='OBJECT')
-    return armature_object
-
-def create_mesh_in_blender(name, vertices, faces, uvs, normals, armature):
-    mesh = bpy.data.meshes.new(name)
-    mesh.from_pydata(vertices, [], faces)
-    
-    if uvs:
-        uv_layer = mesh.uv_layers.new(name='UVMap')
-        for face in mesh.polygons:
-            for vert_idx, loop_idx in zip(face.vertices, face.loop_indices):
-                if vert_idx < len(uvs):
-                    uv_layer.data[loop_idx].uv = uvs[vert_idx]
-                else:
-                    print(f"UV index {vert_idx} out of range")
-
-    if normals:
-        loop_normals = []
-        for face in mesh.polygons:
-            for vert_idx in face.vertices:
-                if vert_idx < len(normals):
-                    loop_normals.append(normals[vert_idx])
-                else:
-                    loop_normals.append((0, 0, 0))
-                    print(f"Normal index {vert_idx} out of range")
-        mesh.normals_split_custom_set(loop_normals)
-    
-    mesh.update()
-
-    mesh_object = bpy.data.objects.new(name, mesh)
-    scene = bpy.context.scene
-    scene.collection.objects.link(mesh_object)
-
-    modifier = mesh_object.modifiers.new(name='Armature', type='ARMATURE')
-    modifier.object = armature
-    mesh_object.parent = armature
-
-    return mesh_object
-
-def set_vertex_weights(mesh_object, armature, weights, bones):
-    for bone in armature.data.bones:
-        group = mesh_object.vertex_groups.new(name=bone.name)
-        for vert_idx, weight_data in enumerate(weights):
-            for bone_id, weight in weight_data.items():
-                if bone_id in bones and bones[bone_id]['name'] == bone.name:
-                    print(f"Assigning weight {weight} to vertex {vert_idx} for bone {bone.name}")
-                    group.add([vert_idx], weight, 'ADD')
-
-def main():
-    input_file = file_path  # Replace with the path to your JSON file
-
-    json_data = read_json(input_file)
-
-    bone_list, bones = extract_bone_data(json_data)
-    armature = create_armature('ImportedArmature', bone_list, bones)
-
-    for node in json_data['nodes']:
-        if 'mesh' in node:
-            print(f"Processing node: {node['name']['name']}")
-            vertices, faces, uvs, normals, weights = extract_mesh_data(node)
-            mesh_object = create_mesh_in_blender(node['name']['name'], vertices, faces, uvs, normals, armature)
-            set_vertex_weights(mesh_object, armature, weights, bones)
-
-    print(f"Mesh and rig imported successfully")
+    except (ValueError, struct.error) as e:
+        fail(model, offset, e)
+        # A node whose mesh failed is still kept, without the mesh
+        if node is not None and not node.extent:
+            yield node
+
+    finally:
+        if log_file is not None:
+            log_file.close()
+
+def parse_data(file_path, log_file_path=None, selection=None, quiet=False):
+    """Decode a [meshes] file into a Model.
+
+    If log_file_path is given, a human readable dump of every decoded element
+    is written there, it is also logged at DEBUG level when tracing is on.
+    selection is called with (node index, node name, mesh name) for every
+    mesh; meshes it rejects keep their header but their vertex and triangle
+    data are skipped (mesh.decoded is False). With quiet, nothing is logged.
+    """
+    nodes = iter_model(file_path, log_file_path, selection, quiet)
+    model = next(nodes)
+    model.nodes.extend(nodes)
+    if quiet:
+        return model
+
+    meshes = [node.mesh for node in model.nodes if node.mesh is not None]
+    logger.info("Parsed %s: %d nodes, %d of %d meshes decoded, %d vertices", os.path.basename(file_path), len(model.nodes),
+                sum(mesh.decoded for mesh in meshes), len(meshes), sum(mesh.vertex_count for mesh in meshes if mesh.decoded))
+    return model
+
+def scan_data(file_path, quiet=False):
+    """Read the node and mesh headers of a [meshes] file without decoding any geometry."""
+    return parse_data(file_path, selection=lambda index, node_name, mesh_name: False, quiet=quiet)
 
 if __name__ == "__main__":
-    # Sample placeholder for writing output to file
-    with open(output_path, "w") as log_file:
-        log_file.write("Parsed data from model file.")
-    parse_data(file_path, log_file_path)
+    # Usable without Blender: python -m io_import_snowrunner.model_parser <file> [log file]
+    import sys
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+    parse_data(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
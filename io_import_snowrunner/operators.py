@@ -0,0 +1,475 @@
+import bpy
+import contextlib
+import cProfile
+import itertools
+import logging
+import math
+import os
+import time
+import tracemalloc
+from bpy.props import BoolProperty, EnumProperty, IntProperty, StringProperty, CollectionProperty
+from bpy.types import AddonPreferences, Operator, PropertyGroup, UIList
+from bpy_extras.io_utils import ImportHelper
+from . import logs, parse_pool, model_cache, model_parser, model_importer, material_importer, telemetry
+
+logger = logging.getLogger(__name__)
+
+# Seconds of import work per event loop iteration of a progressive import
+TIME_SLICE = 0.1
+
+class ImporterAddonPreferences(AddonPreferences):
+    bl_idname = __package__
+
+    base_path: StringProperty(
+        name="Base Textures Path",
+        subtype='DIR_PATH',
+        description="Base directory for textures",
+        default=""
+    )
+
+    link_shader: BoolProperty(
+        name="Link Shader Library",
+        description="Link the Snowrunner shader from the addon's shader.blend instead of appending a copy",
+        default=False
+    )
+
+    parse_workers: IntProperty(
+        name="Parser Processes",
+        description="Processes decoding files in parallel when several files are imported at once (0 uses all but one core)",
+        default=0,
+        min=0
+    )
+
+    mesh_threads: IntProperty(
+        name="Mesh Threads",
+        description="Threads converting the vertex data of the next meshes while one is built (0 uses one per core). "
+                    "Streamed files are converted one mesh at a time",
+        default=0,
+        min=0
+    )
+
+    stream_size: IntProperty(
+        name="Streaming Threshold (MB)",
+        description="Files larger than this are decoded one mesh at a time while they are built, keeping a single mesh in memory. "
+                    "They are decoded in Blender's process and not cached (0 never streams)",
+        default=256,
+        min=0
+    )
+
+    cache_dir: StringProperty(
+        name="Model Cache Folder",
+        subtype='DIR_PATH',
+        description="Where decoded models are cached for faster re-imports (empty uses the addon's user data folder)",
+        default=""
+    )
+
+    cache_size: IntProperty(
+        name="Model Cache Size (MB)",
+        description="Least recently used models are removed from the cache beyond this size (0 disables the cache)",
+        default=1024,
+        min=0
+    )
+
+    proxy_textures: BoolProperty(
+        name="Proxy Textures",
+        description="Load textures from a lower level of their mip chain, for layout work and scenes that need little texture memory",
+        default=False
+    )
+
+    proxy_size: IntProperty(
+        name="Proxy Size",
+        description="Largest width or height of proxy textures",
+        default=512,
+        min=1
+    )
+
+    share_meshes: BoolProperty(
+        name="Share Identical Meshes",
+        description="Give meshes identical to one imported before, in this or an earlier import, the same mesh data instead of a copy. "
+                    "Edits to a shared mesh show up on all of its objects",
+        default=True
+    )
+
+    trace_logging: BoolProperty(
+        name="Trace Logging",
+        description="Log every decoded element, vertex group and material connection to the console. Slow on big models",
+        default=False
+    )
+
+    trace_memory: BoolProperty(
+        name="Trace Memory",
+        description="Measure the peak Python memory of every import stage (slows imports down)",
+        default=False
+    )
+
+    write_telemetry: BoolProperty(
+        name="Write Telemetry",
+        description="Write the time, element counts and memory of every import stage to a JSON file in the telemetry folder",
+        default=False
+    )
+
+    profile_imports: BoolProperty(
+        name="Profile Imports",
+        description="Save a cProfile .prof file of every import to the telemetry folder (decoding in parser processes is not included)",
+        default=False
+    )
+
+    telemetry_dir: StringProperty(
+        name="Telemetry Folder",
+        subtype='DIR_PATH',
+        description="Where telemetry and profiles are written (empty uses the addon's user data folder)",
+        default=""
+    )
+
+    def draw(self, context):
+        layout = self.layout
+        layout.label(text="Base Textures Path Should Be Your Editor Folder (Ex: F:\\archives\\snowrunner\\editor\\)")
+        layout.prop(self, "base_path")
+        layout.prop(self, "link_shader")
+        layout.prop(self, "parse_workers")
+        layout.prop(self, "mesh_threads")
+        layout.prop(self, "stream_size")
+        layout.prop(self, "cache_dir")
+        layout.prop(self, "cache_size")
+        row = layout.row()
+        row.prop(self, "proxy_textures")
+        row.prop(self, "proxy_size")
+        layout.operator(FullResolutionTexturesOperator.bl_idname)
+        layout.prop(self, "share_meshes")
+        layout.prop(self, "trace_logging")
+        layout.prop(self, "trace_memory")
+        layout.prop(self, "write_telemetry")
+        layout.prop(self, "profile_imports")
+        layout.prop(self, "telemetry_dir")
+
+def get_model_cache(addon_prefs):
+    if addon_prefs.cache_size <= 0:
+        return None
+    if addon_prefs.cache_dir:
+        directory = bpy.path.abspath(addon_prefs.cache_dir)
+    else:
+        directory = bpy.utils.user_resource('DATAFILES', path="io_import_snowrunner/model_cache", create=True)
+    return model_cache.ModelCache(directory, addon_prefs.cache_size * 1024 * 1024)
+
+def get_telemetry_dir(addon_prefs):
+    if addon_prefs.telemetry_dir:
+        directory = bpy.path.abspath(addon_prefs.telemetry_dir)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+    return bpy.utils.user_resource('DATAFILES', path="io_import_snowrunner/telemetry", create=True)
+
+class NodePickItem(PropertyGroup):
+    # Position of the node in the file, node names need not be unique
+    index: IntProperty()
+    mesh_name: StringProperty()
+    vertex_count: IntProperty()
+    lod_level: IntProperty()
+    selected: BoolProperty(default=True)
+
+class SNOWRUNNER_UL_nodes(UIList):
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        row = layout.row()
+        row.prop(item, "selected", text=item.name)
+        row.label(text=f"{item.mesh_name} (LOD {item.lod_level}, {item.vertex_count} vertices)")
+
+class ImportModelOperator(Operator, ImportHelper):
+    bl_idname = "import_test.model"
+    bl_label = "Import Snowrunner Model ([meshes])"
+    filename_ext = ""
+    filter_glob: StringProperty(
+        default="*",
+        options={'HIDDEN'},
+        maxlen=255,
+    )
+
+    files: CollectionProperty(type=bpy.types.PropertyGroup)
+
+    node_filter: StringProperty(
+        name="Node Filter",
+        description="Only import the meshes whose node or mesh name matches one of these comma separated patterns, e.g. cab*, wheel_fl (empty imports everything)",
+        default=""
+    )
+
+    pick_nodes: BoolProperty(
+        name="Pick Nodes",
+        description="Choose the meshes to import from a list of the selected file's nodes",
+        default=False
+    )
+
+    lod: EnumProperty(
+        name="LOD",
+        description="Which LOD of every part to import, told apart by lod markers in node and mesh names (e.g. body_lod1). "
+                    "The other LODs are skipped without being decoded",
+        items=[
+            ('ALL', "All", "Import every LOD"),
+            ('HIGHEST', "Highest Detail", "Only the most detailed LOD of every part"),
+            ('LOWEST', "Lowest Detail", "Only the least detailed LOD of every part"),
+            ('LEVEL', "Level", "Only the chosen LOD level, or the closest more detailed one for parts without it")
+        ],
+        default='ALL'
+    )
+
+    lod_level: IntProperty(
+        name="LOD Level",
+        default=0,
+        min=0
+    )
+
+    progressive: BoolProperty(options={'HIDDEN', 'SKIP_SAVE'})
+
+    node_items: CollectionProperty(type=NodePickItem)
+    node_index: IntProperty()
+    scanned_path: StringProperty(options={'HIDDEN'})
+
+    def check(self, context):
+        changed = ImportHelper.check(self, context)
+        if self.pick_nodes and self.filepath != self.scanned_path:
+            # Only the headers are read, the geometry of the file is skipped
+            self.scanned_path = self.filepath
+            self.node_items.clear()
+            if os.path.isfile(self.filepath):
+                nodes = model_parser.scan_data(self.filepath).nodes
+                lods = model_parser.classify_lods(nodes)
+                for i, node in enumerate(nodes):
+                    if node.mesh is not None:
+                        item = self.node_items.add()
+                        item.name = node.name
+                        item.index = i
+                        item.mesh_name = node.mesh.name
+                        item.vertex_count = node.mesh.vertex_count
+                        item.lod_level = lods[i][1]
+            changed = True
+        return changed
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, "node_filter")
+        row = layout.row()
+        row.prop(self, "lod")
+        if self.lod == 'LEVEL':
+            row.prop(self, "lod_level", text="")
+        layout.prop(self, "pick_nodes")
+        if self.pick_nodes:
+            layout.template_list("SNOWRUNNER_UL_nodes", "", self, "node_items", self, "node_index")
+
+    def node_selection(self):
+        patterns = tuple(pattern.strip() for pattern in self.node_filter.split(',') if pattern.strip())
+        indices = None
+        if self.pick_nodes and len(self.node_items):
+            # The picks are from the scanned file, other files of the import ignore them
+            indices = frozenset(item.index for item in self.node_items if item.selected)
+        lod = {'HIGHEST': 'highest', 'LOWEST': 'lowest', 'LEVEL': self.lod_level}.get(self.lod)
+        if not patterns and indices is None and lod is None:
+            return None
+        return model_parser.NodeSelection(indices, patterns, lod, self.scanned_path if indices is not None else None)
+
+    def invoke(self, context, event):
+        # Imports started from the file browser run in steps, scripts get a blocking call
+        self.progressive = True
+        return ImportHelper.invoke(self, context, event)
+
+    def execute(self, context):
+        addon_prefs = context.preferences.addons[__package__].preferences
+        logs.configure_logging(addon_prefs.trace_logging)
+
+        self._addon_prefs = addon_prefs
+        self._profiler = cProfile.Profile() if addon_prefs.profile_imports else None
+        self._stop_tracing = addon_prefs.trace_memory and not tracemalloc.is_tracing()
+        self._file_telemetries = []
+        self._snapshot = None
+        self._modal = self.progressive and not bpy.app.background
+        self._progress = 0.0
+        self._steps = self.import_steps(addon_prefs)
+
+        if self._modal:
+            wm = context.window_manager
+            self._timer = wm.event_timer_add(0.01, window=context.window)
+            wm.progress_begin(0, 1000)
+            wm.modal_handler_add(self)
+            return {'RUNNING_MODAL'}
+
+        try:
+            self.run_steps(math.inf)
+        except Exception:
+            self.cancel(context)
+            raise
+        self.finish(context)
+        return {'FINISHED'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.cancel(context)
+            self.report({'WARNING'}, "Import cancelled")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        try:
+            done = self.run_steps(time.perf_counter() + TIME_SLICE)
+        except Exception as e:
+            self.cancel(context)
+            self.report({'ERROR'}, f"Import failed: {e}")
+            return {'CANCELLED'}
+
+        if done:
+            self.finish(context)
+            return {'FINISHED'}
+        context.window_manager.progress_update(int(self._progress * 1000))
+        return {'RUNNING_MODAL'}
+
+    def run_steps(self, deadline):
+        """Run import steps until deadline, returning True once all files are imported."""
+        if self._profiler is not None:
+            self._profiler.enable()
+        try:
+            while time.perf_counter() < deadline:
+                progress = next(self._steps)
+                if progress is None:
+                    # Waiting on the parser, give the time slice back
+                    break
+                self._progress = progress
+        except StopIteration:
+            return True
+        finally:
+            if self._profiler is not None:
+                self._profiler.disable()
+        return False
+
+    def end(self, context):
+        if getattr(self, '_timer', None) is not None:
+            context.window_manager.event_timer_remove(self._timer)
+            context.window_manager.progress_end()
+            self._timer = None
+        if self._stop_tracing:
+            tracemalloc.stop()
+
+    def cancel(self, context):
+        # Also called by Blender when the running import is cancelled from outside. Closing the steps
+        # cancels the files still queued for parsing without waiting on the one being decoded
+        self._steps.close()
+        if self._snapshot is not None:
+            # Drop what was built of the file being imported, finished files stay
+            if context.object is not None and context.object.mode != 'OBJECT':
+                bpy.ops.object.mode_set(mode='OBJECT')
+            removed = model_importer.remove_created(self._snapshot)
+            logger.info("Removed %d datablocks of the cancelled import", removed)
+            self._snapshot = None
+        self.end(context)
+
+    def finish(self, context):
+        self.end(context)
+        addon_prefs = self._addon_prefs
+
+        for file_telemetry in self._file_telemetries:
+            self.report({'INFO'}, file_telemetry.summary())
+
+        if addon_prefs.write_telemetry or self._profiler is not None:
+            telemetry_dir = get_telemetry_dir(addon_prefs)
+            stamp = time.strftime('%Y%m%d_%H%M%S')
+            if addon_prefs.write_telemetry:
+                report_path = os.path.join(telemetry_dir, f"import_{stamp}.json")
+                telemetry.write_report(report_path, self._file_telemetries)
+                self.report({'INFO'}, f"Telemetry written to {report_path}")
+            if self._profiler is not None:
+                profile_path = os.path.join(telemetry_dir, f"import_{stamp}.prof")
+                self._profiler.dump_stats(profile_path)
+                self.report({'INFO'}, f"Profile written to {profile_path}")
+
+    def import_steps(self, addon_prefs):
+        """Import the selected files one step at a time, yielding the progress from 0 to 1 after every step.
+
+        None is yielded instead while a progressive import waits on the parser processes.
+        """
+        directory = os.path.dirname(self.filepath)
+        textures = material_importer.load_texture_index(addon_prefs.base_path)
+
+        file_paths = [os.path.join(directory, file.name) for file in self.files]
+        proxy_size = addon_prefs.proxy_size if addon_prefs.proxy_textures else 0
+
+        # Files are decoded in worker processes and built here as each one finishes. Files above the
+        # streaming threshold come last, decoded here one mesh at a time as the meshes are built
+        selection = self.node_selection()
+        cache = get_model_cache(addon_prefs)
+        stream_bytes = addon_prefs.stream_size * 1024 * 1024
+        streamed = {file_path for file_path in file_paths if stream_bytes and os.path.getsize(file_path) > stream_bytes}
+        # A progressive import polls the parser instead of waiting on it, so the UI keeps running
+        results = parse_pool.parse_files([file_path for file_path in file_paths if file_path not in streamed],
+                                         addon_prefs.parse_workers, selection, cache, addon_prefs.trace_memory,
+                                         block=not self._modal)
+        stream_results = (parse_pool.stream_file(file_path, addon_prefs.trace_memory)
+                          for file_path in file_paths if file_path in streamed)
+        done = 0
+        with contextlib.closing(results):
+            for result in itertools.chain(results, stream_results):
+                if result is None:
+                    yield None
+                    continue
+                file_path, model, error, file_telemetry = result
+                result = None
+                done += 1
+                self._file_telemetries.append(file_telemetry)
+                if error is not None:
+                    self.report({'ERROR'}, f"Failed to parse {os.path.basename(file_path)}: {error}")
+                    continue
+                if model.error:
+                    self.report({'WARNING'}, f"{os.path.basename(file_path)} was only partially decoded: {model.error}")
+
+                mesh_nodes = [(i, node) for i, node in enumerate(model.nodes) if node.mesh is not None]
+                if file_path in streamed:
+                    nodes = parse_pool.stream_nodes(file_path, model, selection, file_telemetry)
+                    file_selection = selection.resolve(file_path, model) if selection is not None else None
+                    mesh_count = sum(1 for i, node in mesh_nodes
+                                     if file_selection is None or file_selection(i, node.name, node.mesh.name))
+                else:
+                    nodes = None
+                    mesh_count = sum(1 for _, node in mesh_nodes if node.mesh.decoded)
+
+                # Add the nodes and meshes to the scene, then the material data
+                steps = itertools.chain(
+                    model_importer.import_model_steps(model, bpy.path.display_name_from_filepath(file_path),
+                                                      file_telemetry, addon_prefs.share_meshes, nodes,
+                                                      addon_prefs.mesh_threads),
+                    material_importer.import_material_steps(model, textures, addon_prefs.link_shader,
+                                                            file_telemetry, proxy_size))
+                step_count = 1 + len(model.materials) + mesh_count
+
+                self._snapshot = model_importer.datablock_snapshot()
+                for step, _ in enumerate(steps, 1):
+                    yield (done - 1 + min(step / step_count, 1.0)) / len(file_paths)
+                self._snapshot = None
+
+class FullResolutionTexturesOperator(Operator):
+    bl_idname = "snowrunner.full_resolution_textures"
+    bl_label = "Use Full Resolution Snowrunner Textures"
+    bl_description = "Swap every proxy texture of imported Snowrunner materials for its full resolution texture"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        count = material_importer.use_full_resolution()
+        self.report({'INFO'}, f"Switched {count} textures to full resolution")
+        return {'FINISHED'}
+
+def menu_func_import(self, context):
+    self.layout.operator(ImportModelOperator.bl_idname, text="Import Snowrunner Model ([meshes])")
+
+def menu_func_external_data(self, context):
+    self.layout.operator(FullResolutionTexturesOperator.bl_idname)
+
+def register():
+    logs.configure_logging()
+    bpy.utils.register_class(NodePickItem)
+    bpy.utils.register_class(SNOWRUNNER_UL_nodes)
+    bpy.utils.register_class(ImportModelOperator)
+    bpy.utils.register_class(FullResolutionTexturesOperator)
+    bpy.utils.register_class(ImporterAddonPreferences)
+    bpy.types.TOPBAR_MT_file_import.append(menu_func_import)
+    bpy.types.TOPBAR_MT_file_external_data.append(menu_func_external_data)
+
+def unregister():
+    bpy.utils.unregister_class(ImportModelOperator)
+    bpy.utils.unregister_class(FullResolutionTexturesOperator)
+    bpy.utils.unregister_class(ImporterAddonPreferences)
+    bpy.utils.unregister_class(SNOWRUNNER_UL_nodes)
+    bpy.utils.unregister_class(NodePickItem)
+    bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
+    bpy.types.TOPBAR_MT_file_external_data.remove(menu_func_external_data)
@@ -0,0 +1,143 @@
+import contextlib
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from . import logs, model_parser, telemetry
+
+def default_worker_count():
+    # Leave one core for Blender's main thread, which builds the scene meanwhile
+    return max(1, (os.cpu_count() or 1) - 1)
+
+def parse_file(file_path, selection=None, cache=None, trace_memory=False):
+    file_telemetry = telemetry.FileTelemetry(file_path, trace_memory)
+    with file_telemetry.stage('parse') as record:
+        try:
+            if cache is not None:
+                model, error = cache.parse(file_path, selection), None
+            else:
+                model, error = model_parser.parse_data(file_path, selection=selection), None
+            record['count'] = sum(node.mesh.vertex_count for node in model.nodes if node.mesh is not None and node.mesh.decoded)
+        except Exception as e:
+            model, error = None, e
+    return file_path, model, error, file_telemetry
+
+def stream_file(file_path, trace_memory=False):
+    """Read only the node and mesh headers of file_path, for importing it with stream_nodes.
+
+    Returns (file_path, model, error, telemetry) like parse_file. Every mesh
+    of model is marked as not decoded until stream_nodes has decoded it.
+    """
+    file_telemetry = telemetry.FileTelemetry(file_path, trace_memory)
+    with file_telemetry.stage('parse'):
+        try:
+            model, error = model_parser.scan_data(file_path), None
+        except Exception as e:
+            model, error = None, e
+    return file_path, model, error, file_telemetry
+
+def stream_nodes(file_path, model, selection=None, file_telemetry=None):
+    """Decode the nodes of file_path one at a time, yielding each with its mesh.
+
+    model is the header model from stream_file. The previous node is released
+    before the next one is decoded, so a consumer that does not keep them
+    holds at most one mesh in memory. Each decoded mesh marks its header in
+    model as decoded and decoding is recorded in the 'parse' stage.
+    """
+    if file_telemetry is None:
+        file_telemetry = telemetry.FileTelemetry(file_path)
+
+    nodes = model_parser.iter_model(file_path, selection=selection)
+    with contextlib.closing(nodes):
+        with file_telemetry.stage('parse'):
+            stream_model = next(nodes)
+        for header in model.nodes:
+            with file_telemetry.stage('parse') as record:
+                node = next(nodes, None)
+            if node is None:
+                break
+            if node.mesh is not None and node.mesh.decoded:
+                header.mesh.decoded = True
+                record['count'] += node.mesh.vertex_count
+            yield node
+            node = None
+
+    if stream_model.error and not model.error:
+        model.error = stream_model.error
+
+def start_executor(workers):
+    # Forking a running Blender is unsafe, workers start as fresh interpreters
+    context = multiprocessing.get_context('spawn')
+    # Workers log like this process, at its current level
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                               initializer=logs.configure_logging, initargs=(logs.tracing(),))
+
+def parse_files(file_paths, workers=0, selection=None, cache=None, trace_memory=False, block=True):
+    """Decode the files in a process pool, yielding (file_path, model, error, telemetry) as each finishes.
+
+    Results come in completion order so the caller can build one model while
+    the others are still being decoded. With a single file or worker the
+    files are decoded in this process. selection is passed on to
+    model_parser.parse_data and has to be picklable, cache is an optional
+    model_cache.ModelCache. telemetry is the file's telemetry.FileTelemetry
+    with the 'parse' stage recorded, the build stages can be added to it.
+
+    Only about two files per worker are in flight at a time, more are
+    submitted as results are consumed, so finished models the caller has
+    dropped are not kept. Files whose worker died get a BrokenProcessPool
+    error and the remaining files go to a new pool.
+
+    With block False, None is yielded instead of waiting whenever no file is
+    finished, so the caller never stalls on decoding. A single file or worker
+    then decodes in a thread of this process, which keeps the zero-copy views
+    and cache hits of an in-process parse. Closing the generator cancels the
+    queued files without waiting for the running ones.
+    """
+    if not file_paths:
+        return
+    workers = min(workers or default_worker_count(), len(file_paths))
+    if workers <= 1 and block:
+        for file_path in file_paths:
+            yield parse_file(file_path, selection, cache, trace_memory)
+        return
+
+    queued = iter(file_paths)
+    # Future -> file path
+    running = {}
+    finished = set()
+
+    def next_result():
+        # A helper for the same reason as in geometry.prepare_meshes
+        future = finished.pop()
+        file_path = running.pop(future)
+        try:
+            return future.result()
+        except BrokenProcessPool as e:
+            return file_path, None, e, telemetry.FileTelemetry(file_path, trace_memory)
+
+    executor = start_executor(workers) if workers > 1 else ThreadPoolExecutor(max_workers=1)
+    try:
+        while True:
+            for file_path in queued:
+                try:
+                    future = executor.submit(parse_file, file_path, selection, cache, trace_memory)
+                except BrokenProcessPool:
+                    # A worker died, the files it had in flight are reported as failed
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    executor = start_executor(workers)
+                    future = executor.submit(parse_file, file_path, selection, cache, trace_memory)
+                running[future] = file_path
+                future = None
+                if len(running) >= 2 * workers:
+                    break
+            if not running:
+                return
+
+            finished, _ = wait(running, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            if not finished:
+                yield None
+            while finished:
+                yield next_result()
+    finally:
+        # Files still decoding finish in the background, their results are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
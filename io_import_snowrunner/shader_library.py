@@ -0,0 +1,110 @@
+import bpy
+import hashlib
+import os
+
+SHADER_NAME = "Snowrunner Shader"
+SHADER_BLEND_PATH = os.path.join(os.path.dirname(__file__), 'shader.blend')
+TEMPLATE_NAME = ".Snowrunner Material Template"
+
+# Stamped on appended node groups and on the template material so a changed
+# shader.blend is detected in files saved with an older addon version
+VERSION_PROPERTY = "snowrunner_shader_version"
+
+_shader_version = None
+
+def shader_version():
+    global _shader_version
+    if _shader_version is None:
+        with open(SHADER_BLEND_PATH, 'rb') as f:
+            _shader_version = hashlib.sha1(f.read()).hexdigest()
+    return _shader_version
+
+def is_current(node_group):
+    if node_group.library is not None:
+        # Linked data is reloaded from the library file whenever the .blend is opened
+        library_path = bpy.path.abspath(node_group.library.filepath)
+        return os.path.normcase(os.path.abspath(library_path)) == os.path.normcase(SHADER_BLEND_PATH)
+    return node_group.get(VERSION_PROPERTY) == shader_version()
+
+def load_shader(link):
+    with bpy.data.libraries.load(SHADER_BLEND_PATH, link=link) as (data_from, data_to):
+        if SHADER_NAME in data_from.node_groups:
+            data_to.node_groups.append(SHADER_NAME)
+
+    node_group = data_to.node_groups[0] if data_to.node_groups else None
+    if node_group is not None and not link:
+        node_group[VERSION_PROPERTY] = shader_version()
+    return node_group
+
+def get_shader_group(link=False):
+    """Return the Snowrunner shader node group, loading shader.blend only when needed.
+
+    With link=True the group is linked from the shipped shader.blend instead of
+    appended. Groups from an older shader.blend, or loaded the other way, are
+    replaced and their users remapped to the current group.
+    """
+    stale = []
+    for node_group in bpy.data.node_groups:
+        # Also catch numbered duplicates such as "Snowrunner Shader.001"
+        if node_group.name != SHADER_NAME and not node_group.name.startswith(SHADER_NAME + '.'):
+            continue
+        if node_group.name == SHADER_NAME and (node_group.library is not None) == link and is_current(node_group):
+            return node_group
+        stale.append(node_group)
+
+    node_group = load_shader(link)
+    if node_group is None:
+        return None
+
+    for old in stale:
+        old.user_remap(node_group)
+        if old.library is None:
+            bpy.data.node_groups.remove(old)
+    if not link:
+        node_group.name = SHADER_NAME
+
+    return node_group
+
+def get_template_material(shader_group):
+    """Return a material with the shader group, output and one image node per map input.
+
+    Imported materials are copies of this template, so the node tree is only
+    built once per shader version.
+    """
+    template = bpy.data.materials.get(TEMPLATE_NAME)
+    if template is not None:
+        shader_node = template.node_tree.nodes.get(SHADER_NAME) if template.node_tree else None
+        if template.get(VERSION_PROPERTY) == shader_version() and shader_node is not None and shader_node.node_tree == shader_group:
+            return template
+        bpy.data.materials.remove(template)
+
+    template = bpy.data.materials.new(name=TEMPLATE_NAME)
+    template.use_nodes = True
+    nodes = template.node_tree.nodes
+    links = template.node_tree.links
+
+    for node in nodes:
+        nodes.remove(node)
+
+    shader_node = nodes.new(type='ShaderNodeGroup')
+    shader_node.name = SHADER_NAME
+    shader_node.node_tree = shader_group
+
+    output_node = nodes.new(type='ShaderNodeOutputMaterial')
+    links.new(shader_node.outputs['BSDF'], output_node.inputs['Surface'])
+
+    shader_node.location = (0, 0)
+    output_node.location = (200, 0)
+
+    for socket in shader_node.inputs:
+        if socket.name.endswith('Map'):
+            tex_image = nodes.new('ShaderNodeTexImage')
+            tex_image.name = socket.name
+            tex_image.label = socket.name
+            links.new(tex_image.outputs['Color'], socket)
+            tex_image.location = (-200, len(nodes) * -200)
+
+    template[VERSION_PROPERTY] = shader_version()
+    # Keep the template around in saved files even though no object uses it
+    template.use_fake_user = True
+    return template
@@ -0,0 +1,65 @@
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+
+class FileTelemetry:
+    """Wall time, element count and peak traced memory of each import stage of one file.
+
+    Stages entered more than once, e.g. once per mesh, add up. Memory is only
+    measured with trace_memory set, as the peak of Python allocations
+    (NumPy arrays included) above what was allocated when the stage started.
+    """
+
+    def __init__(self, file_path, trace_memory=False):
+        self.file_path = file_path
+        self.trace_memory = trace_memory
+        # Stage name -> {'seconds', 'count', 'peak_bytes'}
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name, memory=True):
+        """Time the block as part of stage name, yielding its record so the block can add to 'count'.
+
+        Pass memory=False for stages nested in another one, they must not reset
+        the outer stage's peak.
+        """
+        record = self.stages.setdefault(name, {'seconds': 0.0, 'count': 0, 'peak_bytes': 0})
+        measure_memory = self.trace_memory and memory
+        if measure_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] += time.perf_counter() - started
+            if measure_memory:
+                record['peak_bytes'] = max(record['peak_bytes'], tracemalloc.get_traced_memory()[1] - baseline)
+
+    def summary(self):
+        parts = []
+        for name, record in self.stages.items():
+            part = f"{name} {record['seconds']:.2f}s"
+            if record['count']:
+                part += f" ({record['count']})"
+            if record['peak_bytes']:
+                part += f" {record['peak_bytes'] / (1024 * 1024):.1f} MB"
+            parts.append(part)
+        return f"{os.path.basename(self.file_path)}: " + ", ".join(parts)
+
+    def to_dict(self):
+        return {'file': self.file_path, 'stages': self.stages}
+
+def write_report(report_path, telemetries):
+    """Write the stage records of the imported files as JSON."""
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'files': [telemetry.to_dict() for telemetry in telemetries]
+    }
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=1)
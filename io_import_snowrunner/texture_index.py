@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+def index_keys(file_name):
+    """Yield the lookup keys of a file name: the whole name and every suffix after an '_'."""
+    key = os.path.normcase(file_name)
+    yield key
+    start = key.find('_')
+    while start != -1:
+        yield key[start + 1:]
+        start = key.find('_', start + 1)
+
+class TextureIndex:
+    """File name index of the editor texture tree under base_path.
+
+    The directory listing is persisted to index_path and revalidated against
+    directory mtimes, so only directories that changed since the last session
+    are listed again. Lookups match like the old fnmatch('*' + texture_name)
+    walk: the first file in walk order whose name ends with texture_name.
+    """
+
+    def __init__(self, base_path, index_path=None):
+        self.base_path = os.path.normpath(base_path) if base_path else ''
+        self.index_path = index_path
+        # Relative directory -> [mtime_ns, file names, subdirectory names]
+        self.directories = {}
+        self.misses = set()
+        self.lookup = {}
+        self.files = []
+        self.dirty = False
+
+    def load(self):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable texture index %s: %s", self.index_path, e)
+            return
+        if data.get('version') != INDEX_VERSION or data.get('base_path') != self.base_path:
+            return
+        self.directories = data['directories']
+        self.misses = set(data['misses'])
+
+    def save(self):
+        if not self.index_path or not self.dirty:
+            return
+        data = {
+            'version': INDEX_VERSION,
+            'base_path': self.base_path,
+            'directories': self.directories,
+            'misses': sorted(self.misses)
+        }
+        temp_path = self.index_path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            # The index is only a head start for the next session, the import goes on without it
+            logger.warning("Could not write the texture index %s: %s", self.index_path, e)
+            return
+        self.dirty = False
+
+    def remove_tree(self, relative_dir):
+        prefix = relative_dir + os.sep
+        for directory in [d for d in self.directories if d == relative_dir or d.startswith(prefix)]:
+            del self.directories[directory]
+
+    def refresh(self):
+        """Re-list every directory whose mtime changed since it was indexed."""
+        changed = False
+        stack = [''] if self.base_path else []
+        while stack:
+            relative_dir = stack.pop()
+            full_dir = os.path.join(self.base_path, relative_dir)
+            try:
+                mtime = os.stat(full_dir).st_mtime_ns
+            except OSError:
+                self.remove_tree(relative_dir)
+                changed = True
+                continue
+
+            entry = self.directories.get(relative_dir)
+            if entry is None or entry[0] != mtime:
+                files, subdirs = [], []
+                try:
+                    with os.scandir(full_dir) as entries:
+                        for dir_entry in entries:
+                            if dir_entry.is_dir():
+                                subdirs.append(dir_entry.name)
+                            else:
+                                files.append(dir_entry.name)
+                except OSError:
+                    self.remove_tree(relative_dir)
+                    changed = True
+                    continue
+
+                if entry is not None:
+                    for removed in set(entry[2]) - set(subdirs):
+                        self.remove_tree(os.path.join(relative_dir, removed))
+                entry = [mtime, files, subdirs]
+                self.directories[relative_dir] = entry
+                changed = True
+
+            # Push in reverse so subdirectories are visited in listing order
+            stack.extend(os.path.join(relative_dir, subdir) for subdir in reversed(entry[2]))
+
+        if changed or not self.lookup:
+            self.build_lookup()
+        if changed:
+            self.misses.clear()
+            self.dirty = True
+
+    def walk(self):
+        """Yield (relative_dir, file names) top-down in the same order as os.walk."""
+        stack = [''] if '' in self.directories else []
+        while stack:
+            relative_dir = stack.pop()
+            entry = self.directories.get(relative_dir)
+            if entry is None:
+                continue
+            yield relative_dir, entry[1]
+            stack.extend(os.path.join(relative_dir, subdir) for subdir in reversed(entry[2]))
+
+    def build_lookup(self):
+        self.lookup = {}
+        self.files = []
+        for relative_dir, files in self.walk():
+            for file_name in files:
+                path = os.path.join(self.base_path, relative_dir, file_name)
+                self.files.append((os.path.normcase(file_name), path))
+                for key in index_keys(file_name):
+                    self.lookup.setdefault(key, path)
+
+    def find(self, texture_name):
+        key = os.path.normcase(texture_name)
+        path = self.lookup.get(key)
+        if path is not None or key in self.misses:
+            return path
+
+        # Suffixes that do not start at an '_' fall back to a scan of the cached names
+        for file_name, candidate in self.files:
+            if file_name.endswith(key):
+                self.lookup[key] = candidate
+                return candidate
+
+        self.misses.add(key)
+        self.dirty = True
+        return None
+
+# Indexes already loaded in this session, keyed by base path
+_indexes = {}
+
+def get_texture_index(base_path, index_dir=None):
+    """Return the revalidated texture index for base_path.
+
+    The index is kept for the rest of the session and, when index_dir is
+    given, persisted there between sessions.
+    """
+    index = _indexes.get(base_path)
+    if index is None:
+        index_path = None
+        if index_dir:
+            digest = hashlib.sha1(os.path.normpath(base_path).encode()).hexdigest()[:16]
+            index_path = os.path.join(index_dir, f"texture_index_{digest}.json")
+        index = TextureIndex(base_path, index_path)
+        index.load()
+        _indexes[base_path] = index
+
+    index.refresh()
+    index.save()
+    return index
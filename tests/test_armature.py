@@ -0,0 +1,50 @@
+"""Armature building, run inside Blender:
+
+    blender -b --python-expr "import sys, pytest; sys.exit(pytest.main(['tests']))"
+"""
+import numpy as np
+import pytest
+
+bpy = pytest.importorskip("bpy")
+
+from io_import_snowrunner import model_importer
+from io_import_snowrunner.model_parser import Node
+
+
+def bone_node(node_id, parent_id, name, translation):
+    matrix = np.eye(4, dtype=np.float32)
+    matrix[3, :3] = translation
+    return Node(parent_id, node_id, 0, name, matrix)
+
+
+@pytest.fixture
+def empty_file():
+    bpy.ops.wm.read_homefile(use_empty=True)
+
+
+def test_build_armature_in_empty_file(empty_file):
+    nodes = [bone_node(1, 0, 'root', (0, 0, 1)), bone_node(2, 1, 'child', (1, 0, 0))]
+    armature_obj = model_importer.build_armature(nodes)
+
+    assert armature_obj.mode == 'OBJECT'
+    bones = armature_obj.data.bones
+    assert [bone.name for bone in bones] == ['root', 'child']
+    assert bones['child'].parent == bones['root']
+    assert tuple(bones['child'].head_local) == pytest.approx((1, 0, 1))
+    assert bpy.context.view_layer.objects.active is None
+
+
+def test_build_armature_restores_active_and_selection(empty_file):
+    other = bpy.data.objects.new('Other', bpy.data.armatures.new('Other'))
+    bpy.context.scene.collection.objects.link(other)
+    bpy.context.view_layer.objects.active = other
+    other.select_set(True)
+
+    armature_obj = model_importer.build_armature([bone_node(1, 0, 'root', (0, 0, 0))])
+
+    assert len(armature_obj.data.bones) == 1
+    assert len(other.data.bones) == 0
+    assert other.mode == 'OBJECT'
+    assert bpy.context.view_layer.objects.active == other
+    assert other.select_get()
+    assert not armature_obj.select_get()
@@ -0,0 +1,31 @@
+import numpy as np
+
+from io_import_snowrunner import geometry
+
+
+def file_matrix(rotation, translation):
+    matrix = np.eye(4, dtype=np.float32)
+    matrix[:3, :3] = rotation
+    matrix[3, :3] = translation
+    return matrix
+
+
+def test_bone_rest_matrices_keep_rotation_and_sum_translations():
+    # A quarter turn about z, not symmetric so a transpose would show
+    rotation = np.array([[0, 1, 0], [-1, 0, 0], [0, 0, 1]], dtype=np.float32)
+    matrices = [
+        file_matrix(np.eye(3), (0, 0, 1)),
+        file_matrix(rotation, (1, 0, 0)),
+        file_matrix(np.eye(3), (0, 2, 0)),
+    ]
+    rest = geometry.bone_rest_matrices(matrices, [-1, 0, 1])
+
+    assert rest.shape == (3, 4, 4)
+    np.testing.assert_array_equal(rest[1, :3, :3], rotation)
+    np.testing.assert_array_equal(rest[:, :3, 3], [(0, 0, 1), (1, 0, 1), (1, 2, 1)])
+    np.testing.assert_array_equal(rest[:, 3], np.tile([0, 0, 0, 1], (3, 1)))
+
+
+def test_bone_rest_matrices_without_parents():
+    rest = geometry.bone_rest_matrices([file_matrix(np.eye(3), (1, 2, 3))], [-1])
+    np.testing.assert_array_equal(rest[0], [[1, 0, 0, 1], [0, 1, 0, 2], [0, 0, 1, 3], [0, 0, 0, 1]])
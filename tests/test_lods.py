@@ -0,0 +1,59 @@
+import numpy as np
+
+from io_import_snowrunner.model_parser import Mesh, Node, NodeSelection, choose_lods, classify_lods, lod_name
+
+
+def node(node_id, parent_id, name, mesh_name=None):
+    mesh = Mesh(mesh_name, 0, 0) if mesh_name is not None else None
+    return Node(parent_id, node_id, 0, name, np.eye(4, dtype=np.float32), mesh)
+
+
+# LOD0 -> {body, wheel}, LOD1 -> {body}
+GROUPED = [
+    node(0, -1, 'root'),
+    node(1, 0, 'LOD0'),
+    node(2, 1, 'body', 'body'),
+    node(3, 1, 'wheel', 'wheel'),
+    node(4, 0, 'LOD1'),
+    node(5, 4, 'body', 'body'),
+]
+
+SUFFIXED = [
+    node(0, -1, 'root'),
+    node(1, 0, 'body_lod0', 'body'),
+    node(2, 0, 'body_lod1', 'body'),
+    node(3, 0, 'cabin', 'cabin_lod0'),
+    node(4, 0, 'cabin', 'cabin_lod2'),
+    node(5, 0, 'door', 'door'),
+]
+
+
+def test_lod_name():
+    assert lod_name('body_lod1') == (1, 'body')
+    assert lod_name('BodyLod2') == (2, 'Body')
+    assert lod_name('LOD_0') == (0, '')
+    assert lod_name('door') == (None, 'door')
+
+
+def test_classify_grouped_children_by_path():
+    lods = classify_lods(GROUPED)
+    assert lods == {2: ('/body', 0), 3: ('/wheel', 0), 5: ('/body', 1)}
+
+
+def test_choose_grouped():
+    assert choose_lods(GROUPED, 'highest') == {2, 3}
+    # The wheel only has LOD0, so every level keeps it
+    assert choose_lods(GROUPED, 'lowest') == {3, 5}
+    assert choose_lods(GROUPED, 1) == {3, 5}
+
+
+def test_choose_suffixed():
+    assert choose_lods(SUFFIXED, 'highest') == {1, 3, 5}
+    assert choose_lods(SUFFIXED, 'lowest') == {2, 4, 5}
+    assert choose_lods(SUFFIXED, 1) == {2, 3, 5}
+
+
+def test_selection_by_index():
+    selection = NodeSelection(indices=frozenset({3}))
+    assert selection(3, 'wheel', 'wheel')
+    assert not selection(2, 'body', 'body')